@@ -0,0 +1,300 @@
+"""
+Waiting room for on-sale spikes.
+
+Setting a showtime's admission_rate puts its bookings behind a waiting
+room. Users join with POST /api/showtimes/{id}/admission/ and get a signed
+ticket carrying their place in line; admission accrues at admission_rate
+users per minute, so polling GET .../admission/?ticket= costs a signature
+check and one counter read. Once the ticket is admitted the response
+includes an admission token, which booking writes send as the
+X-Admission-Token header.
+
+AdmissionControlMiddleware checks that header before the view runs, so
+booking writes without a token are turned away before they open a
+transaction. It only knows session users, so the gated views also carry
+the AdmissionTokenHolder permission, which checks the token was issued to
+the user DRF authenticated. Tokens are signed with SECRET_KEY and checked
+without a database query. The middleware runs sync or async; under ASGI
+only gated booking writes leave the event loop for the check.
+
+Queue counters live in the backend named by ADMISSION_BACKEND: the
+database by default, or process memory for a single process and tests.
+"""
+import json
+import math
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.permissions import BasePermission
+
+from .cache import admission_scope, read_through
+from .models import AdmissionQueue, AdmissionTicket, Showtime
+
+HEADER = 'X-Admission-Token'
+TICKET_SALT = 'bookings.admission.ticket'
+TOKEN_SALT = 'bookings.admission.token'
+# POSTs to these routes claim seats; the showtime comes from the URL or body
+GATED_ROUTES = {'booking-list', 'booking-bulk', 'seathold-list', 'showtime-best-available'}
+
+
+def admitted_now(admitted, issued, updated_at, rate, now):
+    """
+    How many tickets have been let in by `now`
+    Admission accrues at `rate` per minute but never gets ahead of the
+    tickets handed out, so an idle waiting room banks no credit.
+    """
+    elapsed = max(0.0, (now - updated_at).total_seconds())
+    return min(float(issued), admitted + rate * elapsed / 60)
+
+
+class DatabaseBackend:
+    """Queue counters in AdmissionQueue/AdmissionTicket rows"""
+
+    def join(self, showtime_id, user_id, rate, now):
+        """
+        The user's ticket number, handing out the next one if they have none
+        """
+        with transaction.atomic():
+            queue, _ = AdmissionQueue.objects.get_or_create(
+                showtime_id=showtime_id, defaults={'updated_at': now}
+            )
+            # Lock the counters so tickets are numbered one at a time
+            queue = AdmissionQueue.objects.select_for_update().get(pk=queue.pk)
+            number = AdmissionTicket.objects.filter(
+                showtime_id=showtime_id, user_id=user_id
+            ).values_list('number', flat=True).first()
+            if number is not None:
+                return number
+            queue.admitted = admitted_now(queue.admitted, queue.issued, queue.updated_at, rate, now)
+            queue.issued += 1
+            queue.updated_at = now
+            queue.save()
+            AdmissionTicket.objects.create(showtime_id=showtime_id, user_id=user_id, number=queue.issued)
+            return queue.issued
+
+    def admitted(self, showtime_id, rate, now):
+        counters = AdmissionQueue.objects.filter(showtime_id=showtime_id).values_list(
+            'admitted', 'issued', 'updated_at'
+        ).first()
+        if counters is None:
+            return 0.0
+        return admitted_now(*counters, rate, now)
+
+
+class InMemoryBackend:
+    """Queue counters in process memory, for one process or tests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = {}
+
+    def join(self, showtime_id, user_id, rate, now):
+        with self._lock:
+            queue = self._queues.setdefault(
+                showtime_id, {'admitted': 0.0, 'issued': 0, 'updated_at': now, 'tickets': {}}
+            )
+            if user_id in queue['tickets']:
+                return queue['tickets'][user_id]
+            queue['admitted'] = admitted_now(queue['admitted'], queue['issued'], queue['updated_at'], rate, now)
+            queue['issued'] += 1
+            queue['updated_at'] = now
+            queue['tickets'][user_id] = queue['issued']
+            return queue['issued']
+
+    def admitted(self, showtime_id, rate, now):
+        with self._lock:
+            queue = self._queues.get(showtime_id)
+            if queue is None:
+                return 0.0
+            return admitted_now(queue['admitted'], queue['issued'], queue['updated_at'], rate, now)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    path = settings.ADMISSION_BACKEND
+    with _backends_lock:
+        if path not in _backends:
+            _backends[path] = import_string(path)()
+        return _backends[path]
+
+
+def admission_rate(showtime_id):
+    """
+    The showtime's admission_rate, or None if it has no waiting room
+    """
+    def build():
+        rate = Showtime.objects.filter(pk=showtime_id).values_list('admission_rate', flat=True).first()
+        return {'rate': rate}, None
+
+    return read_through('admission_rate', [admission_scope(showtime_id)], build)['rate']
+
+
+def issue_token(showtime_id, user_id):
+    return signing.dumps({'s': showtime_id, 'u': user_id}, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token):
+    """
+    The (showtime id, user id) a valid admission token was issued for, or None
+    """
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.ADMISSION_TOKEN_TTL_SECONDS)
+    except signing.BadSignature:
+        return None
+    return payload['s'], payload['u']
+
+
+def token_showtime(token, user):
+    """
+    The showtime a valid admission token was issued for, or None
+    The user is checked when the request was authenticated by a session;
+    DRF authentication runs later, and AdmissionTokenHolder checks it.
+    """
+    issued = read_token(token)
+    if issued is None:
+        return None
+    if user is not None and user.is_authenticated and issued[1] != user.pk:
+        return None
+    return issued[0]
+
+
+def queue_status(showtime_id, user_id, number, rate, now=None):
+    """
+    Place in line for a ticket, with an admission token once it is let in
+    The first ticket of an idle waiting room gets in straight away.
+    """
+    now = now or timezone.now()
+    ticket = signing.dumps({'s': showtime_id, 'u': user_id, 'n': number}, salt=TICKET_SALT, compress=True)
+    result = {'showtime': showtime_id, 'ticket': ticket, 'position': 0, 'wait_seconds': 0, 'token': None}
+    if rate is not None:
+        ahead = number - 1 - get_backend().admitted(showtime_id, rate, now)
+        # A rate of 0 pauses admission
+        if ahead > 0 or rate == 0:
+            result['position'] = max(1, math.ceil(ahead))
+            result['wait_seconds'] = math.ceil(ahead * 60 / rate) if rate else None
+            return result
+    result['token'] = issue_token(showtime_id, user_id)
+    return result
+
+
+def join_queue(showtime_id, user, now=None):
+    """
+    Join a showtime's waiting room (again) and report the user's place
+    """
+    now = now or timezone.now()
+    rate = admission_rate(showtime_id)
+    number = 1 if rate is None else get_backend().join(showtime_id, user.pk, rate, now)
+    return queue_status(showtime_id, user.pk, number, rate, now)
+
+
+def ticket_status(showtime_id, ticket, user):
+    """
+    Place in line for a signed ticket; None if the ticket is not valid
+    """
+    try:
+        payload = signing.loads(ticket, salt=TICKET_SALT)
+    except signing.BadSignature:
+        return None
+    if payload['s'] != showtime_id or payload['u'] != user.pk:
+        return None
+    return queue_status(showtime_id, user.pk, payload['n'], admission_rate(showtime_id))
+
+
+def request_showtime(request, view_kwargs):
+    """
+    The showtime a booking write is for, read from the URL or body
+    """
+    if 'pk' in view_kwargs:
+        value = view_kwargs['pk']
+    elif request.content_type == 'application/json':
+        try:
+            body = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        value = body.get('showtime') if isinstance(body, dict) else None
+    else:
+        value = request.POST.get('showtime')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def gated(request):
+    match = request.resolver_match
+    return request.method == 'POST' and match is not None and match.url_name in GATED_ROUTES
+
+
+class AdmissionControlMiddleware:
+    """
+    Turn away booking writes for waiting-room showtimes without a token
+    List it after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django awaits an async process_view on the event loop
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not gated(request):
+            return None
+        return self.check(request, view_kwargs)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if not gated(request):
+            return None
+        # Only booking writes read the body and the showtime's rate
+        return await sync_to_async(self.check)(request, view_kwargs)
+
+    def check(self, request, view_kwargs):
+        showtime_id = request_showtime(request, view_kwargs)
+        # Malformed requests are left for the view to reject
+        if showtime_id is None or admission_rate(showtime_id) is None:
+            return None
+        token = request.headers.get(HEADER)
+        if token and token_showtime(token, getattr(request, 'user', None)) == showtime_id:
+            # Left for AdmissionTokenHolder to match against the DRF user
+            request.admission_user_id = read_token(token)[1]
+            return None
+        return JsonResponse(
+            {
+                'error': 'This showtime is selling through a waiting room; join the queue for an admission token',
+                'queue': f'/api/showtimes/{showtime_id}/admission/',
+            },
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+
+class AdmissionTokenHolder(BasePermission):
+    """
+    The admission token let through by the middleware must be the
+    requesting user's, however DRF authenticated them
+    """
+    message = 'This admission token was issued to another user'
+
+    def has_permission(self, request, view):
+        user_id = getattr(request, 'admission_user_id', None)
+        return user_id is None or user_id == request.user.pk
@@ -0,0 +1,345 @@
+"""
+Helpers for seeding large datasets and timing the API in-process.
+
+These write to whatever database is configured, so point DATABASE_URL at a
+scratch database before running the benchmark commands.
+"""
+import asyncio
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+
+from . import best_available
+from .layouts import import_layout
+from .models import Movie, Seat, SeatState, Showtime, Booking
+from .pagination import BookingCursorPagination
+
+BENCH_USERNAME = 'bench-staff'
+BENCH_MOVIE_TITLE = 'Benchmark Feature'
+CATALOG_MOVIE_PREFIX = 'Benchmark Movie'
+CATALOG_SEAT_PREFIX = 'LT'
+BENCH_AUDITORIUM = 'Benchmark Auditorium'
+
+
+def bench_client(user):
+    """
+    API client authenticated as `user`
+    """
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def allow_test_host():
+    """
+    Let the test client's host through ALLOWED_HOSTS outside the test runner
+    Throttling is switched off too: every benchmark request comes from one
+    user or IP.
+    """
+    return override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+    )
+
+
+def seed_bookings(total, seats_per_showtime=1000, batch_size=5000):
+    """
+    Top the bookings table up to `total` rows using bulk inserts
+    Returns the staff user that owns the seeded bookings.
+    """
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(username=BENCH_USERNAME, defaults={'is_staff': True})
+    missing = total - Booking.objects.count()
+    if missing <= 0:
+        return user
+
+    movie, _ = Movie.objects.get_or_create(
+        title=BENCH_MOVIE_TITLE,
+        defaults={'description': 'Seeded for benchmarks', 'release_date': date(2024, 1, 1), 'duration': 120},
+    )
+    # bulk_create skips the post_save handlers, so no seat maps are built
+    # for these rows; the bookings only need distinct (showtime, seat) pairs
+    seats = Seat.objects.bulk_create(
+        [Seat(seat_number=f"BN{i}") for i in range(seats_per_showtime)], batch_size=batch_size
+    )
+    showtime_count = -(-missing // seats_per_showtime)
+    start = timezone.now()
+    showtimes = Showtime.objects.bulk_create(
+        [Showtime(movie=movie, starts_at=start + timedelta(hours=i)) for i in range(showtime_count)],
+        batch_size=batch_size,
+    )
+
+    today = timezone.localdate()
+    batch = []
+    for index in range(missing):
+        batch.append(Booking(
+            user=user,
+            movie=movie,
+            showtime=showtimes[index // seats_per_showtime],
+            seat=seats[index % seats_per_showtime],
+            booking_date=today,
+        ))
+        if len(batch) == batch_size:
+            Booking.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Booking.objects.bulk_create(batch)
+    return user
+
+
+def seed_catalog(movies, seats, showtimes_per_movie=2, batch_size=5000):
+    """
+    Top up benchmark movies, seats and upcoming showtimes with their seat maps
+    Returns the benchmark showtimes.
+    """
+    existing = Movie.objects.filter(title__startswith=CATALOG_MOVIE_PREFIX).count()
+    Movie.objects.bulk_create([
+        Movie(
+            title=f"{CATALOG_MOVIE_PREFIX} {i}",
+            description='Seeded for load tests',
+            release_date=date(2024, 1, 1),
+            duration=90 + i % 60,
+        )
+        for i in range(existing, movies)
+    ], batch_size=batch_size)
+    existing = Seat.objects.filter(seat_number__startswith=CATALOG_SEAT_PREFIX).count()
+    Seat.objects.bulk_create(
+        [Seat(seat_number=f"{CATALOG_SEAT_PREFIX}{i}") for i in range(existing, seats)], batch_size=batch_size
+    )
+
+    catalog = list(Movie.objects.filter(title__startswith=CATALOG_MOVIE_PREFIX).order_by('id')[:movies])
+    start = timezone.now() + timedelta(days=1)
+    new_showtimes = []
+    for movie in catalog:
+        missing = showtimes_per_movie - movie.showtimes.count()
+        new_showtimes += [
+            Showtime(movie=movie, starts_at=start + timedelta(hours=3 * i)) for i in range(missing)
+        ]
+    # bulk_create skips the post_save handler, so build the seat maps here
+    Showtime.objects.bulk_create(new_showtimes, batch_size=batch_size)
+    showtimes = list(Showtime.objects.filter(movie__in=catalog).order_by('id'))
+    SeatState.objects.create_for(
+        showtimes, Seat.objects.filter(seat_number__startswith=CATALOG_SEAT_PREFIX)
+    )
+    return showtimes
+
+
+def time_call(func, repeat):
+    """
+    Median wall time of `func` in milliseconds
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def booking_page_url(page, page_size):
+    """
+    URL of a cursor page, built directly from the keyset position
+    """
+    url = f'/api/bookings/?page_size={page_size}'
+    if page <= 1:
+        return url
+    offset = (page - 1) * page_size
+    position = Booking.objects.order_by('-id').values_list('id', flat=True)[offset - 1]
+    paginator = BookingCursorPagination()
+    paginator.base_url = url
+    return paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(position)))
+
+
+def bench_pagination(bookings, pages, page_size=50, repeat=5):
+    """
+    Time /api/bookings/ at each requested page against OFFSET slicing
+    """
+    user = seed_bookings(bookings)
+    client = bench_client(user)
+    queryset = Booking.objects.select_related('user', 'movie', 'seat').order_by('-id')
+    report = {
+        'bookings': Booking.objects.count(),
+        'page_size': page_size,
+        'repeat': repeat,
+        'cursor_ms': {},
+        'offset_ms': {},
+    }
+
+    with allow_test_host():
+        for page in pages:
+            url = booking_page_url(page, page_size)
+
+            def fetch():
+                response = client.get(url)
+                assert response.status_code == 200, response.status_code
+
+            offset = (page - 1) * page_size
+            report['cursor_ms'][str(page)] = time_call(fetch, repeat)
+            report['offset_ms'][str(page)] = time_call(
+                lambda: list(queryset[offset:offset + page_size]), repeat
+            )
+    return report
+
+
+def bench_best_available(rows=25, seats_per_row=40, requests=200, party_size=4):
+    """
+    Time best-available searches and requests on a fresh showtime
+    The house has rows x seats_per_row seats with aisles a quarter of the
+    way in from each side. Requests hold seats, so the house fills up as
+    they run; keep requests * party_size below the seat count.
+    """
+    aisles = [seats_per_row // 4, seats_per_row - seats_per_row // 4]
+    layout = [{'row': f'R{row}', 'seats': seats_per_row, 'aisles': aisles} for row in range(1, rows + 1)]
+    auditorium = import_layout(BENCH_AUDITORIUM, layout)['auditorium']
+    movie, _ = Movie.objects.get_or_create(
+        title=BENCH_MOVIE_TITLE,
+        defaults={'description': 'Benchmark', 'release_date': date(2020, 1, 1), 'duration': 120},
+    )
+    showtime = Showtime.objects.create(
+        movie=movie, auditorium_id=auditorium, starts_at=timezone.now() + timedelta(days=1)
+    )
+    user, _ = get_user_model().objects.get_or_create(username=BENCH_USERNAME)
+    client = bench_client(user)
+    url = f'/api/showtimes/{showtime.pk}/best_available/'
+    best_available.forget(showtime.pk)
+
+    report = {'seats': rows * seats_per_row, 'party_size': party_size, 'requests': requests}
+    report['index_build_ms'] = time_call(lambda: best_available.ShowtimeSeatIndex.build(showtime), 5)
+    index = best_available.showtime_index(showtime)
+    report['search_ms'] = time_call(lambda: index.best_block(party_size), 100)
+
+    def claim():
+        response = client.post(url, {'party_size': party_size}, format='json')
+        assert response.status_code == 201, response.status_code
+
+    with allow_test_host():
+        report['request_ms'] = time_call(claim, requests)
+    showtime.refresh_from_db()
+    index = best_available.showtime_index(showtime)
+    report['search_ms_after'] = time_call(lambda: index.best_block(party_size), 100)
+    return report
+
+
+# Sync viewset URL and its async counterpart, per endpoint
+ASYNC_ENDPOINTS = {
+    'movies.list': ('/api/movies/', '/api/async/movies/'),
+    'movies.detail': ('/api/movies/{movie}/', '/api/async/movies/{movie}/'),
+    'seats.available': (
+        '/api/seats/available/?showtime={showtime}&page_size=1000',
+        '/api/async/seats/available/?showtime={showtime}',
+    ),
+    'bookings.history': ('/api/bookings/my_bookings/', '/api/async/bookings/'),
+}
+
+
+def session_cookie(user):
+    """
+    Session cookie header value for `user`, as a browser would send it
+    """
+    client = Client()
+    client.force_login(user)
+    return '; '.join(f'{name}={morsel.value}' for name, morsel in client.cookies.items())
+
+
+async def asgi_get(application, url, cookie):
+    """
+    Send one GET through an ASGI application and return its status code
+    This is the same call uvicorn makes for every request, minus the socket.
+    """
+    path, _, query = url.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    received = False
+    finished = asyncio.Event()
+    status = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            finished.set()
+
+    await application(scope, receive, send)
+    finished.set()
+    return status[0]
+
+
+async def drive(application, url, cookie, requests, concurrency):
+    """
+    Send `requests` GETs with at most `concurrency` in flight
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            status = await asgi_get(application, url, cookie)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert status == 200, f'{url} returned {status}'
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'throughput_rps': round(requests / elapsed, 2),
+        'p50_ms': round(latencies[len(latencies) // 2], 3),
+        'p95_ms': round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 3),
+        'p99_ms': round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)], 3),
+    }
+
+
+def bench_async_views(bookings=10_000, movies=20, seats=200, requests=500, concurrency=64):
+    """
+    Compare the sync viewsets with the async views under one event loop
+    Both sides go through the project's ASGI application, so the sync
+    views pay the same thread hops they would under uvicorn.
+    """
+    showtimes = seed_catalog(movies, seats)
+    user = seed_bookings(bookings)
+    targets = {'movie': showtimes[0].movie_id, 'showtime': showtimes[0].pk}
+    cookie = session_cookie(user)
+    report = {'requests': requests, 'concurrency': concurrency, 'endpoints': {}}
+
+    async def run():
+        application = ASGIHandler()
+        for name, urls in ASYNC_ENDPOINTS.items():
+            sync_url, async_url = (url.format(**targets) for url in urls)
+            report['endpoints'][name] = {
+                'sync': await drive(application, sync_url, cookie, requests, concurrency),
+                'async': await drive(application, async_url, cookie, requests, concurrency),
+            }
+
+    with allow_test_host():
+        asyncio.run(run())
+    return report
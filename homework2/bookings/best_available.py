@@ -0,0 +1,226 @@
+"""
+Best-available seat search.
+
+Each showtime gets an in-memory index of its rows. Every row keeps its
+free seats as runs of consecutive columns (aisles are column gaps, so a
+run never crosses one), which makes finding the best block for a party a
+walk over a few runs rather than over every seat.
+
+Indexes are cached per process and keyed by the showtime's seat_version.
+seat_map_changed() hands every committed change made in this process to
+seat_map_applied(), which patches the index in place; a change made
+elsewhere shows up as a version gap and the index is rebuilt with one query.
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import SeatState
+
+# Rows this far from the front (0) to the back (1) have the best view
+BEST_ROW_FRACTION = 0.6
+# How many seats sideways from the centre one row nearer or further is worth
+ROW_WEIGHT = 2.0
+MAX_INDEXES = 256
+# Searches to try before giving up when other requests keep taking the seats
+CLAIM_ATTEMPTS = 3
+
+_lock = threading.Lock()
+_indexes = OrderedDict()
+
+
+class RowIndex:
+    """One row: seat ids by column, accessible columns and free runs"""
+
+    def __init__(self, label, position):
+        self.label = label
+        self.position = position
+        self.seats = {}
+        self.accessible = set()
+        self.free = set()
+        self.runs = []
+        self.center = 0.0
+
+    def rebuild_runs(self):
+        """
+        Recompute the (first, last) column runs of free seats
+        """
+        runs = []
+        for column in sorted(self.free):
+            if runs and runs[-1][1] == column - 1:
+                runs[-1][1] = column
+            else:
+                runs.append([column, column])
+        self.runs = [tuple(run) for run in runs]
+
+    def start_ranges(self, first, last, party_size, accessible):
+        """
+        (lowest, highest) block start columns inside one free run
+        With `accessible` only blocks covering an accessible seat count.
+        """
+        if not accessible:
+            return [(first, last - party_size + 1)]
+        return [
+            (max(first, column - party_size + 1), min(column, last - party_size + 1))
+            for column in sorted(self.accessible)
+            if first <= column <= last
+        ]
+
+
+class ShowtimeSeatIndex:
+    """Free runs of every row of one showtime as of one seat_version"""
+
+    def __init__(self, showtime_id, version, rows, valid_until=None):
+        self.showtime_id = showtime_id
+        self.version = version
+        self.rows = rows
+        self.labels = {row.label: row.position for row in rows}
+        self.valid_until = valid_until
+        self.lock = threading.Lock()
+        self.columns = {}
+        for row in rows:
+            for column, seat_id in row.seats.items():
+                self.columns[seat_id] = (row, column)
+
+    @classmethod
+    def build(cls, showtime, now=None):
+        """
+        Index a showtime's laid-out seats with a single query
+        Rows are ordered front to back by their lowest seat id, which is
+        the order layouts are imported in. Held seats count as taken, so
+        the index goes stale when the first hold expires.
+        """
+        now = now or timezone.now()
+        rows = {}
+        valid_until = None
+        states = SeatState.objects.filter(
+            showtime=showtime, seat__column__isnull=False
+        ).order_by('seat_id').values_list(
+            'seat_id', 'seat__row', 'seat__column', 'seat__is_accessible', 'booking_status', 'held_until'
+        )
+        for seat_id, label, column, accessible, booked, held_until in states:
+            row = rows.get(label)
+            if row is None:
+                row = rows[label] = RowIndex(label, len(rows))
+            row.seats[column] = seat_id
+            if accessible:
+                row.accessible.add(column)
+            held = held_until is not None and held_until > now
+            if held and (valid_until is None or held_until < valid_until):
+                valid_until = held_until
+            if not booked and not held:
+                row.free.add(column)
+        for row in rows.values():
+            row.center = (min(row.seats) + max(row.seats)) / 2
+            row.rebuild_runs()
+        return cls(showtime.pk, showtime.seat_version, list(rows.values()), valid_until)
+
+    def is_current(self, showtime, now):
+        return self.version == showtime.seat_version and (self.valid_until is None or now < self.valid_until)
+
+    def best_block(self, party_size, center=True, row_from=None, row_to=None, accessible=False):
+        """
+        Seat ids of the best block of `party_size` adjacent free seats
+        Rows nearest BEST_ROW_FRACTION of the way back win, then, with
+        `center`, blocks nearest the middle of their row; without it the
+        leftmost block of the best row. Returns None if no block fits.
+        """
+        if not self.rows:
+            return None
+        low = self.labels.get(row_from, 0)
+        high = self.labels.get(row_to, len(self.rows) - 1)
+        low, high = min(low, high), max(low, high)
+        best_row = BEST_ROW_FRACTION * (len(self.rows) - 1)
+        best = None
+        with self.lock:
+            for row in self.rows[low:high + 1]:
+                row_score = ROW_WEIGHT * abs(row.position - best_row)
+                if best is not None and row_score >= best[0]:
+                    continue
+                # Start column that would put the block dead centre
+                target = row.center - (party_size - 1) / 2
+                for first, last in row.runs:
+                    if last - first + 1 < party_size:
+                        continue
+                    for start_low, start_high in row.start_ranges(first, last, party_size, accessible):
+                        if start_low > start_high:
+                            continue
+                        if center:
+                            start = max(start_low, min(round(target), start_high))
+                            score = row_score + abs(start - target)
+                        else:
+                            start, score = start_low, row_score
+                        if best is None or score < best[0]:
+                            best = (score, row, start)
+        if best is None:
+            return None
+        _, row, start = best
+        return [row.seats[column] for column in range(start, start + party_size)]
+
+    def apply(self, version, available, unavailable, now):
+        """
+        Patch the index with a change; False if it can't be patched
+        """
+        seat_ids = [*available, *unavailable]
+        if version != self.version + 1 or any(seat_id not in self.columns for seat_id in seat_ids):
+            return False
+        with self.lock:
+            changed = set()
+            for seat_id in available:
+                row, column = self.columns[seat_id]
+                row.free.add(column)
+                changed.add(row)
+            for seat_id in unavailable:
+                row, column = self.columns[seat_id]
+                row.free.discard(column)
+                changed.add(row)
+            for row in changed:
+                row.rebuild_runs()
+            self.version = version
+            if unavailable:
+                # These may be holds, which are free again after the TTL
+                expires = now + timedelta(seconds=settings.SEAT_HOLD_TTL_SECONDS)
+                if self.valid_until is None or expires < self.valid_until:
+                    self.valid_until = expires
+        return True
+
+
+def showtime_index(showtime, now=None):
+    """
+    The current index for a showtime, built if missing or stale
+    """
+    now = now or timezone.now()
+    with _lock:
+        index = _indexes.get(showtime.pk)
+        if index is not None:
+            _indexes.move_to_end(showtime.pk)
+    if index is None or not index.is_current(showtime, now):
+        index = ShowtimeSeatIndex.build(showtime, now)
+        with _lock:
+            _indexes[showtime.pk] = index
+            while len(_indexes) > MAX_INDEXES:
+                _indexes.popitem(last=False)
+    return index
+
+
+def seat_map_applied(showtime_id, version, available=(), unavailable=()):
+    """
+    Apply a committed seat map change to the cached index, if any
+    """
+    with _lock:
+        index = _indexes.get(showtime_id)
+    if index is not None and not index.apply(version, available, unavailable, timezone.now()):
+        forget(showtime_id)
+
+
+def forget(showtime_id):
+    with _lock:
+        _indexes.pop(showtime_id, None)
+
+
+def clear():
+    with _lock:
+        _indexes.clear()
@@ -0,0 +1,147 @@
+"""
+Versioned read-through cache for serialized API responses.
+
+Every cache key embeds the current version of the scopes it was built
+from (the movie catalog, one movie, one showtime's seat map, ...).
+Invalidating means bumping a scope's version: entries built from the old
+version are never read again and simply age out, so nothing has to find
+and delete them.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import SeatState
+
+CATALOG_SCOPE = 'movies'
+SEATS_SCOPE = 'seats'
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def get_cache():
+    return caches[settings.BOOKINGS_CACHE_ALIAS]
+
+
+def movie_scope(movie_id):
+    return f'movie:{int(movie_id)}'
+
+
+def showtime_scope(showtime_id):
+    return f'showtime:{int(showtime_id)}'
+
+
+def admission_scope(showtime_id):
+    # Separate from showtime_scope, which every booking bumps
+    return f'admission:{int(showtime_id)}'
+
+
+def pricing_scope(showtime_id):
+    # A showtime's seat zones and start for pricing; sales don't bump it
+    return f'pricing:{int(showtime_id)}'
+
+
+def version_key(scope):
+    return f'bookings:version:{scope}'
+
+
+def fresh_version():
+    # Start counters from the clock so a counter that was evicted never
+    # comes back at a value that old entries were built with
+    return time.time_ns()
+
+
+def get_versions(scopes):
+    """
+    Current version of each scope, creating missing counters
+    """
+    cache = get_cache()
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, fresh_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """
+    Invalidate every entry built from these scopes
+    """
+    cache = get_cache()
+    for scope in scopes:
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            cache.add(version_key(scope), fresh_version(), None)
+
+
+def bump_on_commit(*scopes):
+    """
+    Invalidate once the current transaction commits
+
+    Bumping earlier would let a concurrent reader cache pre-commit data
+    under the new version.
+    """
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def record(name, outcome):
+    with _stats_lock:
+        counters = _stats.setdefault(name, {'hits': 0, 'misses': 0})
+        counters[outcome] += 1
+
+
+def stats():
+    """
+    Hit/miss counters per cached view since the process started
+    """
+    with _stats_lock:
+        return {name: dict(counters) for name, counters in _stats.items()}
+
+
+def read_through(name, scopes, build, vary=''):
+    """
+    Return the cached value for `name`, building it on a miss
+
+    `build` returns (value, timeout); a timeout of None uses
+    BOOKINGS_CACHE_TIMEOUT. `vary` distinguishes entries of the same
+    view, e.g. the request path and query string.
+    """
+    versions = get_versions(scopes)
+    tag = hashlib.md5(vary.encode()).hexdigest()
+    key = 'bookings:%s:%s:%s' % (name, tag, ':'.join(str(version) for version in versions))
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        record(name, 'hits')
+        return value
+    record(name, 'misses')
+    value, timeout = build()
+    cache.set(key, value, settings.BOOKINGS_CACHE_TIMEOUT if timeout is None else timeout)
+    return value
+
+
+def availability_timeout(showtime_id):
+    """
+    Seconds until the next hold on a showtime lapses, or None
+
+    Holds lapse without any write, so availability entries must not
+    outlive the earliest one.
+    """
+    now = timezone.now()
+    next_expiry = SeatState.objects.filter(
+        showtime_id=showtime_id, held_until__gt=now
+    ).aggregate(next_expiry=Min('held_until'))['next_expiry']
+    if next_expiry is None:
+        return None
+    return max(1, math.ceil((next_expiry - now).total_seconds()))
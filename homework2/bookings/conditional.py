@@ -0,0 +1,97 @@
+"""
+Conditional GET support (ETag / Last-Modified).
+
+Validators are never computed by rendering and hashing the body, so a 304
+can be sent before any serializer runs. A single object's come from its
+updated_at/version columns. A list's ETag comes from one aggregate query
+over the rows it is built from, so every worker agrees on it: their count
+and newest updated_at (a write moves a row to the newest, a delete or a
+change of owner changes the count). Lists send no Last-Modified: the
+newest row left after a delete can be older than the client's copy.
+"""
+import hashlib
+from functools import reduce
+
+from django.db.models import Count, Max, Min, Q, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Seat, SeatState, Showtime
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag over the URL, the negotiated format and the given parts
+    """
+    parts = (request.accepted_renderer.format, request.get_full_path()) + parts
+    return '"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def newest_timestamp(values):
+    return max((value for value in values if hasattr(value, 'timestamp')), default=None)
+
+
+def newest(queryset, field='updated_at'):
+    """
+    Aggregate of the largest `field` in another table
+    An uncorrelated subquery read off the field's index, so other tables
+    can be folded into a list's aggregate query.
+    """
+    return Max(Subquery(queryset.order_by(f'-{field}').values(field)[:1]))
+
+
+def list_etag(request, queryset, **extra):
+    """
+    ETag of a list from its rows' count and newest updated_at
+    `extra` aggregates cover what the rows don't carry themselves, such as
+    the movies nested in them.
+    """
+    values = queryset.order_by().aggregate(count=Count('pk'), modified=Max('updated_at'), **extra)
+    return make_etag(request, *(values[name] for name in sorted(values)))
+
+
+def seat_map_etag(request, showtime_id, now=None):
+    """
+    ETag of a list of one showtime's seats
+    Covers the seat version every seat map change bumps, the booked count
+    (the waitlist takes back freed seats without a bump) and the next hold
+    to lapse, which frees a seat without any write at all.
+    """
+    now = now or timezone.now()
+    values = SeatState.objects.filter(showtime_id=showtime_id).aggregate(
+        version=newest(Showtime.objects.filter(pk=showtime_id), 'seat_version'),
+        booked=Count('pk', filter=Q(booking_status=True)),
+        next_expiry=Min('held_until', filter=Q(held_until__gt=now)),
+        seats=newest(Seat.objects.all()),
+    )
+    return make_etag(request, *(values[name] for name in sorted(values)))
+
+
+def object_validators(request, instance, fields):
+    """
+    ETag and Last-Modified of one object from the same fields
+    """
+    values = [
+        reduce(lambda obj, name: getattr(obj, name, None), field.split('__'), instance)
+        for field in fields
+    ]
+    return make_etag(request, instance.pk, *values), newest_timestamp(values)
+
+
+def not_modified(request, etag, last_modified):
+    """
+    A 304 response if the client's copy is current, otherwise None
+    """
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
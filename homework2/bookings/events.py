@@ -0,0 +1,254 @@
+"""
+Append-only booking event log and the projections replayed from it.
+
+Every booking write appends one BookingEvent per booking in its own
+transaction (record()), so the log holds each create, cancel and transfer
+even after the booking row is gone. A consumer keeps the position of the
+last event it has handled as its cursor and reads the next batch after it
+with read_events().
+
+Ids alone don't make a safe cursor: concurrent writers commit in any
+order, so an event could commit below a cursor that has already moved
+past it. On PostgreSQL each event carries its writer's transaction id and
+the log is read in (transaction_id, id) order, only up to the oldest
+transaction still in flight (pg_snapshot_xmin). Every event below that
+line has committed and any event yet to commit sorts above it, so a
+cursor never skips one, and writers never wait on each other for it.
+SQLite allows one writer at a time, so there ids follow commit order and
+every transaction_id is 0.
+
+A Projection is a set of tables derived from the log. catch_up() applies
+the events after its ProjectionCheckpoint batch by batch, updating the
+checkpoint in the same transaction, and rebuild() empties the tables and
+replays the whole log. Derived tables are updated by these workers
+(`python manage.py project_events`), not by the booking writes.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import BookingEvent, BookingHistory, ProjectionCheckpoint, ShowtimeOccupancy
+
+EVENT_BATCH_SIZE = 1000
+# Position of the start of the log: (transaction_id, id)
+START = (0, 0)
+
+
+def pending(kind, bookings, from_user_id=None):
+    """
+    Unsaved `kind` events for these bookings
+    Build cancellations before deleting the bookings (a deleted booking
+    has no id), then append() them at the end of the transaction.
+    """
+    now = timezone.now()
+    return [
+        BookingEvent(
+            kind=kind,
+            booking_id=booking.pk,
+            user_id=booking.user_id,
+            from_user_id=from_user_id,
+            movie_id=booking.movie_id,
+            showtime_id=booking.showtime_id,
+            seat_id=booking.seat_id,
+            price=booking.price,
+            created_at=now,
+        )
+        for booking in bookings
+    ]
+
+
+def current_transaction_id():
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_current_xact_id()::text::bigint')
+        return cursor.fetchone()[0]
+
+
+def append(events):
+    """
+    Insert events stamped with the writing transaction's id
+    Readers hold back a transaction's events until it ends, so a long
+    write delays the tail of the log but never reorders it.
+    """
+    if not events:
+        return []
+    transaction_id = current_transaction_id()
+    for event in events:
+        event.transaction_id = transaction_id
+    return BookingEvent.objects.bulk_create(events, batch_size=EVENT_BATCH_SIZE)
+
+
+def record(kind, bookings, from_user_id=None):
+    """
+    Append one `kind` event per booking, last thing in the transaction
+    """
+    return append(pending(kind, bookings, from_user_id))
+
+
+def position(event):
+    return event.transaction_id, event.pk
+
+
+def format_cursor(position):
+    return '%d-%d' % position
+
+
+def parse_cursor(cursor):
+    """
+    The position in a cursor from format_cursor()
+    """
+    transaction_id, event_id = cursor.split('-')
+    return int(transaction_id), int(event_id)
+
+
+def read_events(after=START, limit=EVENT_BATCH_SIZE):
+    """
+    Up to `limit` committed events after the position `after`, in log order
+    """
+    transaction_id, event_id = after
+    events = BookingEvent.objects.filter(
+        Q(transaction_id__gt=transaction_id) | Q(transaction_id=transaction_id, pk__gt=event_id)
+    )
+    if connection.vendor == 'postgresql':
+        # Stop below every transaction still in flight
+        events = events.filter(transaction_id__lt=RawSQL(
+            'pg_snapshot_xmin(pg_current_snapshot())::text::bigint', []
+        ))
+    return list(events.order_by('transaction_id', 'pk')[:limit])
+
+
+class Projection:
+    """
+    Tables derived from the booking event log
+    Subclasses name the projection, list the models it writes and apply
+    a batch of events with a few bulk queries.
+    """
+    name = None
+    models = ()
+
+    def reset(self):
+        for model in self.models:
+            model.objects.all().delete()
+
+    def apply(self, events):
+        raise NotImplementedError
+
+
+class OccupancyProjection(Projection):
+    """Seats booked and cancelled per showtime"""
+    name = 'occupancy'
+    models = (ShowtimeOccupancy,)
+
+    def apply(self, events):
+        deltas = defaultdict(lambda: [0, 0])
+        for event in events:
+            if event.showtime_id is None:
+                continue
+            if event.kind == BookingEvent.CREATED:
+                deltas[event.showtime_id][0] += 1
+            elif event.kind == BookingEvent.CANCELLED:
+                deltas[event.showtime_id][0] -= 1
+                deltas[event.showtime_id][1] += 1
+        rows = ShowtimeOccupancy.objects.in_bulk(list(deltas))
+        new = []
+        for showtime_id, (booked, cancelled) in deltas.items():
+            row = rows.get(showtime_id)
+            if row is None:
+                new.append(ShowtimeOccupancy(showtime_id=showtime_id, booked=booked, cancelled=cancelled))
+            else:
+                row.booked += booked
+                row.cancelled += cancelled
+        ShowtimeOccupancy.objects.bulk_create(new, batch_size=EVENT_BATCH_SIZE)
+        ShowtimeOccupancy.objects.bulk_update(rows.values(), ['booked', 'cancelled'], batch_size=EVENT_BATCH_SIZE)
+
+
+class HistoryProjection(Projection):
+    """Every booking each user has held, and what became of it"""
+    name = 'history'
+    models = (BookingHistory,)
+
+    def apply(self, events):
+        existing = {
+            (row.booking_id, row.user_id): row
+            for row in BookingHistory.objects.filter(booking_id__in={event.booking_id for event in events})
+        }
+        new = {}
+        changed = {}
+
+        def entry(user_id, event):
+            key = (event.booking_id, user_id)
+            if key in existing:
+                changed[key] = existing[key]
+                return existing[key]
+            if key not in new:
+                new[key] = BookingHistory(
+                    user_id=user_id, booking_id=event.booking_id, movie_id=event.movie_id,
+                    showtime_id=event.showtime_id, seat_id=event.seat_id, price=event.price,
+                    booked_at=event.created_at,
+                )
+            return new[key]
+
+        for event in events:
+            if event.kind == BookingEvent.TRANSFERRED:
+                previous = entry(event.from_user_id, event)
+                previous.status = BookingHistory.TRANSFERRED
+                previous.updated_at = event.created_at
+            row = entry(event.user_id, event)
+            if event.kind == BookingEvent.CANCELLED:
+                row.status = BookingHistory.CANCELLED
+            else:
+                row.status = BookingHistory.ACTIVE
+                row.booked_at = event.created_at
+            row.updated_at = event.created_at
+        BookingHistory.objects.bulk_create(new.values(), batch_size=EVENT_BATCH_SIZE)
+        BookingHistory.objects.bulk_update(
+            changed.values(), ['status', 'booked_at', 'updated_at'], batch_size=EVENT_BATCH_SIZE
+        )
+
+
+PROJECTIONS = {projection.name: projection for projection in (OccupancyProjection(), HistoryProjection())}
+
+
+def locked_checkpoint(projection):
+    ProjectionCheckpoint.objects.get_or_create(name=projection.name)
+    return ProjectionCheckpoint.objects.select_for_update().get(name=projection.name)
+
+
+def catch_up(projection, batch_size=EVENT_BATCH_SIZE):
+    """
+    Apply the events after a projection's checkpoint until none are left
+    Each batch and its checkpoint commit together, so a batch is applied
+    exactly once however the worker stops. Returns how many were applied.
+    """
+    applied = 0
+    while True:
+        with transaction.atomic():
+            checkpoint = locked_checkpoint(projection)
+            events = read_events((checkpoint.transaction_id, checkpoint.position), batch_size)
+            if not events:
+                return applied
+            projection.apply(events)
+            checkpoint.transaction_id, checkpoint.position = position(events[-1])
+            checkpoint.save(update_fields=['transaction_id', 'position', 'updated_at'])
+        applied += len(events)
+        # A short batch reached the end of the log
+        if len(events) < batch_size:
+            return applied
+
+
+def rebuild(projection, batch_size=EVENT_BATCH_SIZE):
+    """
+    Empty a projection's tables and replay the whole log into them
+    Runs in one transaction, so readers see the old tables until the new
+    ones are complete.
+    """
+    with transaction.atomic():
+        checkpoint = locked_checkpoint(projection)
+        projection.reset()
+        checkpoint.transaction_id, checkpoint.position = START
+        checkpoint.save(update_fields=['transaction_id', 'position', 'updated_at'])
+        return catch_up(projection, batch_size)
@@ -0,0 +1,109 @@
+"""
+Idempotency-Key support for booking writes.
+
+A client that may retry a POST sends the same Idempotency-Key header with
+every attempt. The first attempt claims the key by inserting its row in
+the same transaction as the write and stores the response there; retries
+get that response back without running the view again, so they never
+touch the seat tables.
+
+A duplicate that arrives while the first attempt is still running blocks
+on the key's unique index until that transaction commits, then replays
+its response. Keys are kept for IDEMPOTENCY_KEY_TTL_SECONDS; run
+`python manage.py expire_idempotency_keys` to delete old ones.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """
+    sha256 of what the request asks for, to catch keys reused for another request
+    """
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def stored_key(user, key, now):
+    """
+    The unexpired record for a key, deleting an expired one
+    """
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is not None and record.expires_at <= now:
+        record.delete()
+        return None
+    return record
+
+
+def replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response(
+            {'error': 'This Idempotency-Key was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def run_once(handler, view, request, key, fingerprint, now, args, kwargs):
+    """
+    Run the view with the key claimed, storing its response on success
+    Exceptions and server errors roll the claim back so the request can
+    be retried with the same key.
+    """
+    with transaction.atomic():
+        record = IdempotencyKey.objects.create(
+            user=request.user,
+            key=key,
+            fingerprint=fingerprint,
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+        )
+        response = handler(view, request, *args, **kwargs)
+        if response.status_code >= 500:
+            transaction.set_rollback(True)
+            return response
+        record.status_code = response.status_code
+        record.response = response.data
+        record.save(update_fields=['status_code', 'response'])
+    return response
+
+
+def idempotent(handler):
+    """
+    Make a viewset write replayable with an Idempotency-Key header
+    Requests without the header run as usual.
+    """
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: f'Must be 1 to {MAX_KEY_LENGTH} characters'})
+
+        fingerprint = request_fingerprint(request)
+        now = timezone.now()
+        record = stored_key(request.user, key, now)
+        if record is None:
+            try:
+                return run_once(handler, view, request, key, fingerprint, now, args, kwargs)
+            except IntegrityError:
+                # A concurrent duplicate claimed the key and has committed
+                record = IdempotencyKey.objects.get(user=request.user, key=key)
+        return replay(record, fingerprint)
+
+    return wrapper
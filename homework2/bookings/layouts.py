@@ -0,0 +1,156 @@
+"""
+Auditorium seat-layout import.
+
+A layout lists each row with its seat count, the seat numbers an aisle
+follows, and which seats are accessible or premium:
+
+    {"auditorium": "Screen 1", "rows": [
+        {"row": "A", "seats": 20, "aisles": [5, 15], "accessible": [1, 2]},
+        {"row": "B", "seats": 20, "aisles": [5, 15], "premium": true}
+    ]}
+
+or, as CSV with space separated seat lists ("all" marks a whole row):
+
+    row,seats,aisles,accessible,premium
+    A,20,5 15,1 2,
+    B,20,5 15,,all
+
+Importing is idempotent: seats are matched on (auditorium, row, number),
+new ones are bulk inserted and changed ones bulk updated.
+"""
+import csv
+import io
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.parsers import BaseParser
+
+from . import best_available
+from .cache import SEATS_SCOPE, bump_on_commit
+from .models import Auditorium, Seat, SeatState, Showtime
+from .realtime import seat_map_changed
+
+BATCH_SIZE = 1000
+SEAT_FIELDS = ('seat_number', 'column', 'is_accessible', 'is_premium')
+
+
+class CSVTextParser(BaseParser):
+    """Hand a text/csv request body to the view as a string"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream.read().decode('utf-8-sig')
+
+
+def parse_seat_list(value):
+    """
+    "1 2 3" -> [1, 2, 3]; "all" -> True
+    Anything else is returned as is for the layout serializer to reject.
+    """
+    value = value.strip()
+    if value.lower() == 'all':
+        return True
+    try:
+        return [int(number) for number in value.split()]
+    except ValueError:
+        return value
+
+
+def parse_csv_layout(text):
+    """
+    Turn CSV layout text into the row dicts of a JSON layout
+    """
+    rows = []
+    for line in csv.DictReader(io.StringIO(text)):
+        row = {'row': (line.get('row') or '').strip(), 'seats': (line.get('seats') or '').strip()}
+        for key in ('aisles', 'accessible', 'premium'):
+            if line.get(key):
+                row[key] = parse_seat_list(line[key])
+        rows.append(row)
+    return rows
+
+
+def seat_flags(value, count):
+    """
+    Seat numbers selected by a list of numbers or True for the whole row
+    """
+    if value is True:
+        return set(range(1, count + 1))
+    return set(value or ())
+
+
+def layout_seats(auditorium, rows):
+    """
+    Unsaved Seat objects for validated layout rows, keyed by (row, number)
+    """
+    seats = {}
+    for spec in rows:
+        label, count = spec['row'], spec['seats']
+        aisles = set(spec.get('aisles', ()))
+        accessible = seat_flags(spec.get('accessible'), count)
+        premium = seat_flags(spec.get('premium'), count)
+        column = 0
+        for number in range(1, count + 1):
+            column += 1
+            seats[label, number] = Seat(
+                auditorium_id=auditorium.id,
+                row=label,
+                number=number,
+                column=column,
+                seat_number=f'{label}{number}',
+                is_accessible=number in accessible,
+                is_premium=number in premium,
+            )
+            if number in aisles:
+                column += 1
+    return seats
+
+
+def import_layout(name, rows):
+    """
+    Create or update an auditorium's seats from validated layout rows
+    Returns the auditorium id and how many seats were created, updated
+    or left unchanged.
+    """
+    with transaction.atomic():
+        auditorium, _ = Auditorium.objects.get_or_create(name=name)
+        wanted = layout_seats(auditorium, rows)
+        existing = {
+            (seat.row, seat.number): seat
+            for seat in Seat.objects.filter(auditorium=auditorium).only('id', 'row', 'number', *SEAT_FIELDS)
+        }
+
+        created = [seat for key, seat in wanted.items() if key not in existing]
+        changed = []
+        for key, seat in wanted.items():
+            current = existing.get(key)
+            if current is None:
+                continue
+            if any(getattr(current, field) != getattr(seat, field) for field in SEAT_FIELDS):
+                for field in SEAT_FIELDS:
+                    setattr(current, field, getattr(seat, field))
+                current.updated_at = timezone.now()
+                changed.append(current)
+
+        # bulk_create skips the post_save handlers, so the new seats are
+        # added to upcoming showtimes here
+        Seat.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        Seat.objects.bulk_update(changed, [*SEAT_FIELDS, 'updated_at'], batch_size=BATCH_SIZE)
+        if created or changed:
+            showtimes = list(Showtime.objects.filter(auditorium=auditorium, starts_at__gte=timezone.now()))
+            SeatState.objects.create_for(showtimes, created)
+            for showtime in showtimes:
+                # Bumped for moved or re-flagged seats too, so best-available
+                # indexes built from the old layout are rebuilt
+                seat_map_changed(showtime.pk, available=[seat.pk for seat in created])
+                transaction.on_commit(partial(best_available.forget, showtime.pk))
+        if created or changed:
+            bump_on_commit(SEATS_SCOPE)
+
+    return {
+        'auditorium': auditorium.id,
+        'created': len(created),
+        'updated': len(changed),
+        'unchanged': len(wanted) - len(created) - len(changed),
+    }
@@ -0,0 +1,236 @@
+"""
+Concurrent load tests for the booking API, run in-process.
+
+Worker threads drive the API through the DRF test client, each with its own
+database connection, so the run needs nothing but the configured database.
+Point DATABASE_URL at a scratch database: the run seeds and writes to it.
+"""
+import math
+import random
+import threading
+import time
+
+from django.db import DatabaseError, connection, connections
+from django.test.utils import CaptureQueriesContext
+
+from .benchmark import allow_test_host, bench_client, seed_bookings, seed_catalog
+from .models import Booking, Movie, SeatState
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of numbers
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def timed_request(endpoint, send):
+    """
+    Send one request and record its latency, status and query count
+    Database errors (lock timeouts, serialization failures) are recorded
+    instead of raised so one failed request doesn't end the run.
+    """
+    error = None
+    status_code = None
+    response = None
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        try:
+            response = send()
+            status_code = response.status_code
+        except DatabaseError as exc:
+            error = type(exc).__name__
+        elapsed = (time.perf_counter() - start) * 1000
+    sample = {
+        'endpoint': endpoint,
+        'ms': elapsed,
+        'status': status_code,
+        'error': error,
+        'queries': len(queries),
+    }
+    return sample, response
+
+
+class LoadContext:
+    """Seeded objects the scenarios pick their targets from"""
+
+    def __init__(self, showtimes, seat_ids, busy_movie_id):
+        self.showtimes = showtimes
+        self.seat_ids = seat_ids
+        self.busy_movie_id = busy_movie_id
+
+
+def list_movies(context, client, rng):
+    sample, _ = timed_request('movies.list', lambda: client.get('/api/movies/'))
+    return [sample]
+
+
+def available_seats(context, client, rng):
+    showtime = rng.choice(context.showtimes)
+    sample, _ = timed_request(
+        'seats.available', lambda: client.get(f'/api/seats/available/?showtime={showtime.pk}')
+    )
+    return [sample]
+
+
+def bookings_by_movie(context, client, rng):
+    sample, _ = timed_request(
+        'bookings.by_movie',
+        lambda: client.get(f'/api/bookings/by_movie/?movie_id={context.busy_movie_id}'),
+    )
+    return [sample]
+
+
+def book_and_cancel(context, client, rng):
+    """
+    Book a random seat and cancel it again
+    Workers pick seats independently, so collisions show up as 409s.
+    """
+    showtime = rng.choice(context.showtimes)
+    seat_id = rng.choice(context.seat_ids)
+    created, response = timed_request(
+        'bookings.create',
+        lambda: client.post('/api/bookings/', {'showtime': showtime.pk, 'seat': seat_id}, format='json'),
+    )
+    if created['status'] != 201:
+        return [created]
+    booking_id = response.data['id']
+    cancelled, _ = timed_request(
+        'bookings.cancel', lambda: client.post(f'/api/bookings/{booking_id}/cancel/')
+    )
+    return [created, cancelled]
+
+
+SCENARIOS = {
+    'movies': list_movies,
+    'seats_available': available_seats,
+    'by_movie': bookings_by_movie,
+    'book_cancel': book_and_cancel,
+}
+
+
+def run_scenario(scenario, context, user, requests, concurrency, seed=0):
+    """
+    Run `requests` operations of one scenario across `concurrency` threads
+    Returns the raw samples and the wall time in seconds.
+    """
+    operation = SCENARIOS[scenario]
+    samples = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(index):
+        client = bench_client(user)
+        rng = random.Random(f'{seed}:{scenario}:{index}')
+        try:
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                results = operation(context, client, rng)
+                with lock:
+                    samples.extend(results)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    """
+    Per-endpoint latency percentiles, throughput, query counts and errors
+    A 409 or a database error counts as contention; any other non-2xx
+    response is an error.
+    """
+    report = {}
+    for endpoint in sorted({sample['endpoint'] for sample in samples}):
+        rows = [sample for sample in samples if sample['endpoint'] == endpoint]
+        latencies = [row['ms'] for row in rows]
+        queries = [row['queries'] for row in rows]
+        contention = sum(1 for row in rows if row['error'] or row['status'] == 409)
+        errors = sum(
+            1 for row in rows
+            if not row['error'] and row['status'] != 409 and not 200 <= row['status'] < 300
+        )
+        report[endpoint] = {
+            'requests': len(rows),
+            'throughput_rps': round(len(rows) / elapsed, 2) if elapsed else None,
+            **{f'p{pct}_ms': round(percentile(latencies, pct), 3) for pct in PERCENTILES},
+            'queries_avg': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'contention': contention,
+            'errors': errors,
+        }
+    return report
+
+
+def run_load(scenarios, movies=20, seats=200, bookings=10_000, showtimes_per_movie=2,
+             requests=200, concurrency=8, seed=0):
+    """
+    Seed the database, then run each scenario and report on it
+    """
+    showtimes = seed_catalog(movies, seats, showtimes_per_movie)
+    user = seed_bookings(bookings)
+    # Clear bookings left over from an interrupted run so every seat starts free
+    SeatState.objects.filter(showtime__in=showtimes, booking_status=True).update(booking_status=False)
+    Booking.objects.filter(showtime__in=showtimes).delete()
+
+    busy_movie = Movie.objects.filter(bookings__isnull=False).order_by('id').first()
+    seat_ids = list(
+        SeatState.objects.filter(showtime=showtimes[0]).values_list('seat_id', flat=True)
+    )
+    context = LoadContext(showtimes, seat_ids, busy_movie.pk if busy_movie else 0)
+
+    report = {
+        'database': connection.vendor,
+        'seed': seed,
+        'concurrency': concurrency,
+        'requests_per_scenario': requests,
+        'dataset': {
+            'movies': Movie.objects.count(),
+            'showtimes': len(showtimes),
+            'seats_per_showtime': len(seat_ids),
+            'bookings': Booking.objects.count(),
+        },
+        'scenarios': {},
+    }
+    with allow_test_host():
+        for scenario in scenarios:
+            samples, elapsed = run_scenario(scenario, context, user, requests, concurrency, seed)
+            report['scenarios'][scenario] = {
+                'seconds': round(elapsed, 3),
+                'endpoints': summarize(samples, elapsed),
+            }
+    return report
+
+
+def compare_reports(baseline, current, tolerance=0.25):
+    """
+    List the endpoints whose p95 latency or query count got worse
+    Latency may grow by `tolerance` (a fraction) before it is flagged;
+    any rise in the maximum query count is flagged.
+    """
+    regressions = []
+    for scenario, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(scenario, {}).get('endpoints', {})
+        for endpoint, stats in result['endpoints'].items():
+            if endpoint not in before:
+                continue
+            old = before[endpoint]
+            if stats['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{endpoint}: p95 {old['p95_ms']}ms -> {stats['p95_ms']}ms")
+            if stats['queries_max'] > old['queries_max']:
+                regressions.append(f"{endpoint}: queries {old['queries_max']} -> {stats['queries_max']}")
+    return regressions
@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from bookings.benchmark import bench_async_views
+
+
+class Command(BaseCommand):
+    help = "Compare the sync read viewsets with their async counterparts through the ASGI app"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=10_000)
+        parser.add_argument('--movies', type=int, default=20)
+        parser.add_argument('--seats', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=500, help="Requests per endpoint and mode")
+        parser.add_argument('--concurrency', type=int, default=64)
+
+    def handle(self, *args, **options):
+        report = bench_async_views(
+            options['bookings'], options['movies'], options['seats'],
+            options['requests'], options['concurrency'],
+        )
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,21 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from bookings.benchmark import bench_best_available
+
+
+class Command(BaseCommand):
+    help = "Time best-available seat searches and hold requests for one showtime"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=25)
+        parser.add_argument('--seats-per-row', type=int, default=40)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--party-size', type=int, default=4)
+
+    def handle(self, *args, **options):
+        report = bench_best_available(
+            options['rows'], options['seats_per_row'], options['requests'], options['party_size'],
+        )
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,21 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from bookings.benchmark import bench_pagination
+
+
+class Command(BaseCommand):
+    help = "Seed bookings and compare cursor page latency at shallow and deep pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=1_000_000)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 10_000])
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        report = bench_pagination(
+            options['bookings'], options['pages'], options['page_size'], options['repeat']
+        )
+        self.stdout.write(json.dumps(report, indent=2))
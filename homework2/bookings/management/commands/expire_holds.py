@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookings.models import SeatHold
+
+
+class Command(BaseCommand):
+    help = "Release expired seat holds back into inventory"
+
+    def handle(self, *args, **options):
+        released = SeatHold.objects.expire()
+        self.stdout.write(f"Released {released} held seat(s)")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookings.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete Idempotency-Key records past IDEMPOTENCY_KEY_TTL_SECONDS"
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.expired().delete()
+        self.stdout.write(f"Deleted {deleted} expired idempotency key(s)")
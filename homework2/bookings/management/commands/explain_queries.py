@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bookings.benchmark import seed_bookings
+from bookings.models import Booking, Seat, SeatState
+from bookings.query_plans import analyze, explain_hot_queries
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot viewset queries and fail if any of them scans a whole table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=0, help="Seed up to this many bookings first")
+        parser.add_argument('--plans', action='store_true', help="Print the full plan for every query")
+
+    def handle(self, *args, **options):
+        # Everything written to get realistic plans is rolled back, so the
+        # database is left as it was found
+        with transaction.atomic():
+            report = self.explain(options)
+            transaction.set_rollback(True)
+
+        for entry in report:
+            status = {True: 'index', False: 'SCAN', None: '?'}[entry['uses_index']]
+            self.stdout.write(f"{status:<6} {entry['query']}")
+            if options['plans'] or entry['uses_index'] is False:
+                self.stdout.write(entry['plan'])
+        scans = [entry['query'] for entry in report if entry['uses_index'] is False]
+        if scans:
+            raise CommandError(f"Full table scans in: {', '.join(scans)}")
+
+    def explain(self, options):
+        if options['bookings']:
+            seed_bookings(options['bookings'])
+        booking = Booking.objects.select_related('user', 'movie', 'showtime').exclude(showtime=None).last()
+        if booking is None:
+            raise CommandError("No bookings to sample; seed some with --bookings")
+        # Seeded showtimes have no seat map yet; the showtime queries need one
+        showtime = booking.showtime
+        SeatState.objects.create_for([showtime], Seat.objects.filter(auditorium_id=showtime.auditorium_id))
+        analyze()
+        return explain_hot_queries(booking.user, booking.movie, showtime)
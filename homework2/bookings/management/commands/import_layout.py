@@ -0,0 +1,43 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.layouts import import_layout, parse_csv_layout
+from bookings.serializers import SeatLayoutSerializer
+
+
+class Command(BaseCommand):
+    help = "Create or update an auditorium's seats from a JSON or CSV layout file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Layout file (.json or .csv)")
+        parser.add_argument('--auditorium', help="Auditorium name (required for CSV, overrides JSON)")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        try:
+            text = path.read_text(encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+        if path.suffix.lower() == '.csv':
+            data = {'auditorium': options['auditorium'], 'rows': parse_csv_layout(text)}
+        else:
+            try:
+                data = json.loads(text)
+            except ValueError as exc:
+                raise CommandError(f"Cannot parse {path}: {exc}")
+            if not isinstance(data, dict):
+                raise CommandError(f"{path} must hold a JSON object")
+            if options['auditorium']:
+                data['auditorium'] = options['auditorium']
+
+        serializer = SeatLayoutSerializer(data=data)
+        if not serializer.is_valid():
+            raise CommandError(json.dumps(serializer.errors))
+        start = time.perf_counter()
+        result = import_layout(serializer.validated_data['auditorium'], serializer.validated_data['rows'])
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        self.stdout.write(json.dumps(result))
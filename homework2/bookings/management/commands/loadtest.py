@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.loadtest import SCENARIOS, compare_reports, run_load
+
+
+class Command(BaseCommand):
+    help = "Seed a scratch database and load test the booking API with concurrent clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--movies', type=int, default=20)
+        parser.add_argument('--seats', type=int, default=200)
+        parser.add_argument('--bookings', type=int, default=10_000)
+        parser.add_argument('--showtimes-per-movie', type=int, default=2)
+        parser.add_argument('--requests', type=int, default=200, help="Operations per scenario")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Also write the JSON report to this file")
+        parser.add_argument('--baseline', help="Fail if p95 or query counts regress against this report")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p95 growth as a fraction")
+
+    def handle(self, *args, **options):
+        report = run_load(
+            options['scenarios'],
+            movies=options['movies'],
+            seats=options['seats'],
+            bookings=options['bookings'],
+            showtimes_per_movie=options['showtimes_per_movie'],
+            requests=options['requests'],
+            concurrency=options['concurrency'],
+            seed=options['seed'],
+        )
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                regressions = compare_reports(json.load(baseline_file), report, options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against baseline:\n" + '\n'.join(regressions))
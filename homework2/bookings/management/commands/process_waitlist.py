@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.waitlist import process_waitlist
+
+
+class Command(BaseCommand):
+    help = "Offer seats freed at sold-out showtimes to waitlisted users, oldest first"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run a single pass and exit")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between passes")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = process_waitlist()
+            if options['once']:
+                self.stdout.write(
+                    "Offered {offered}, released {released}, skipped {skipped} seat(s); "
+                    "expired {expired} offer(s)".format(**counts)
+                )
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.events import PROJECTIONS, catch_up, rebuild
+
+
+class Command(BaseCommand):
+    help = "Apply new booking events to the projections, or rebuild them from the whole log"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'projections', nargs='*', help=f"Projections to update (default: all of {', '.join(PROJECTIONS)})"
+        )
+        parser.add_argument('--rebuild', action='store_true', help="Empty the projections and replay the log")
+        parser.add_argument('--once', action='store_true', help="Run a single pass and exit")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between passes")
+
+    def handle(self, *args, **options):
+        unknown = set(options['projections']) - PROJECTIONS.keys()
+        if unknown:
+            raise CommandError(f"Unknown projection(s): {', '.join(sorted(unknown))}")
+        projections = [PROJECTIONS[name] for name in options['projections'] or PROJECTIONS]
+        if options['rebuild']:
+            for projection in projections:
+                self.stdout.write(f"Rebuilt {projection.name} from {rebuild(projection)} event(s)")
+            return
+        while True:
+            for projection in projections:
+                applied = catch_up(projection)
+                if options['once']:
+                    self.stdout.write(f"Applied {applied} event(s) to {projection.name}")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from bookings.rollups import reconcile
+
+
+class Command(BaseCommand):
+    help = "Rebuild the sales rollups from the bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true', help="Only count the rollup rows that are out of date"
+        )
+
+    def handle(self, *args, **options):
+        result = reconcile(dry_run=options['dry_run'])
+        verb = "Found" if options['dry_run'] else "Fixed"
+        self.stdout.write(
+            f"{verb} {result['showtimes']} showtime and {result['days']} daily rollup row(s) out of date"
+        )
@@ -0,0 +1,221 @@
+"""
+Per-route request metrics in the Prometheus text format.
+
+RequestMetricsMiddleware records every request's total time, database time
+and query count. For a sampled fraction of requests (METRICS_SAMPLE_RATE)
+it also times serialization and captures the SQL and call site of slow
+queries, which cost a stack walk each. Metrics live in process memory, so
+each worker counts only the requests it served and a scrape of /metrics
+reads whichever worker answers it. Nothing merges them: with several
+workers, scrape each one on its own port (or run one worker) and sum the
+series in Prometheus.
+"""
+import contextvars
+import os
+import threading
+import time
+import traceback
+from collections import deque
+
+from django.conf import settings
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+RECENT_SLOW_QUERIES = 50
+
+_current = contextvars.ContextVar('bookings_request_metrics', default=None)
+_lock = threading.Lock()
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name, help_text, buckets, labels=('route', 'method')):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self.series = {}
+
+    def observe(self, label_values, value):
+        with _lock:
+            counts = self.series.setdefault(label_values, [[0] * len(self.buckets), 0, 0.0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[0][index] += 1
+            counts[1] += 1
+            counts[2] += value
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with _lock:
+            series = [(key, list(value[0]), value[1], value[2]) for key, value in self.series.items()]
+        for label_values, buckets, count, total in sorted(series):
+            for bound, bucket_count in zip(self.buckets, buckets):
+                labels = format_labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{labels} {bucket_count}')
+            labels = format_labels(self.labels, label_values, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {total:.6f}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, label_values, amount=1):
+        with _lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with _lock:
+            series = sorted(self.series.items())
+        for label_values, value in series:
+            lines.append(f'{self.name}{format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+REQUESTS = Counter('bookings_requests_total', 'Requests served.', ('route', 'method', 'status'))
+REQUEST_SECONDS = Histogram(
+    'bookings_request_duration_seconds', 'Time spent handling a request.', SECONDS_BUCKETS
+)
+DB_SECONDS = Histogram(
+    'bookings_request_db_seconds', 'Time spent in database queries per request.', SECONDS_BUCKETS
+)
+QUERIES = Histogram('bookings_request_queries', 'Database queries per request.', QUERY_BUCKETS)
+SERIALIZER_SECONDS = Histogram(
+    'bookings_request_serializer_seconds',
+    'Time spent serializing per request (sampled requests only).',
+    SECONDS_BUCKETS,
+)
+SLOW_QUERIES = Counter(
+    'bookings_slow_queries_total', 'Slow queries seen in sampled requests.', ('route', 'site')
+)
+METRICS = (REQUESTS, REQUEST_SECONDS, DB_SECONDS, QUERIES, SERIALIZER_SECONDS, SLOW_QUERIES)
+
+_slow_queries = deque(maxlen=RECENT_SLOW_QUERIES)
+
+
+def call_site():
+    """
+    The innermost project frame outside this module, as "path:line in func"
+    """
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename == __file__ or not filename.startswith(base_dir) or '-packages' in filename:
+            continue
+        return f'{os.path.relpath(filename, base_dir)}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class RequestMetrics:
+    """Counters for one request, also used as a database execute wrapper"""
+
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.slow_seconds = settings.METRICS_SLOW_QUERY_MS / 1000
+        self.route = 'unmatched'
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializing = False
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_seconds += elapsed
+            if self.sampled and elapsed >= self.slow_seconds:
+                self.slow.append((sql, elapsed, call_site()))
+
+
+def start_request(sampled):
+    record = RequestMetrics(sampled)
+    return record, _current.set(record)
+
+
+def finish_request(record, token, method, status, elapsed):
+    """
+    Fold one request's counters into the process-wide metrics
+    """
+    _current.reset(token)
+    labels = (record.route, method)
+    REQUESTS.inc((record.route, method, str(status)))
+    REQUEST_SECONDS.observe(labels, elapsed)
+    DB_SECONDS.observe(labels, record.db_seconds)
+    QUERIES.observe(labels, record.queries)
+    if record.sampled:
+        SERIALIZER_SECONDS.observe(labels, record.serializer_seconds)
+    for sql, seconds, site in record.slow:
+        SLOW_QUERIES.inc((record.route, site))
+        with _lock:
+            _slow_queries.append({
+                'route': record.route,
+                'ms': round(seconds * 1000, 3),
+                'site': site,
+                'sql': sql,
+            })
+
+
+def time_serialization(serialize, instance):
+    """
+    Call serialize(instance), timing it when the request is sampled
+    Nested serializers run inside their parent's timing and aren't counted twice.
+    """
+    record = _current.get()
+    if record is None or not record.sampled or record.serializing:
+        return serialize(instance)
+    record.serializing = True
+    start = time.perf_counter()
+    try:
+        return serialize(instance)
+    finally:
+        record.serializing = False
+        record.serializer_seconds += time.perf_counter() - start
+
+
+def render():
+    """
+    Every metric in the Prometheus text exposition format
+    """
+    lines = []
+    for metric in METRICS:
+        lines += metric.collect()
+    return '\n'.join(lines) + '\n'
+
+
+def slow_queries():
+    with _lock:
+        return list(_slow_queries)
+
+
+def reset():
+    with _lock:
+        for metric in METRICS:
+            metric.series.clear()
+        _slow_queries.clear()
@@ -0,0 +1,104 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+
+def add_execute_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def remove_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record per-route timing, database time and query counts
+    List it first in MIDDLEWARE so the total covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        sampled = random.random() < settings.METRICS_SAMPLE_RATE
+        record, token = metrics.start_request(sampled)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(record):
+                response = self.get_response(request)
+        except Exception:
+            self.finish(request, record, token, 500, start)
+            raise
+        self.finish(request, record, token, response.status_code, start)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        sampled = random.random() < settings.METRICS_SAMPLE_RATE
+        record, token = metrics.start_request(sampled)
+        start = time.perf_counter()
+        # Database connections are per thread and the async ORM runs on the
+        # request's sync thread, so the wrapper has to be installed there
+        await sync_to_async(add_execute_wrapper)(record)
+        try:
+            response = await self.get_response(request)
+        except Exception:
+            self.finish(request, record, token, 500, start)
+            raise
+        finally:
+            await sync_to_async(remove_execute_wrapper)(record)
+        self.finish(request, record, token, response.status_code, start)
+        return response
+
+    def finish(self, request, record, token, status, start):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            record.route = match.view_name
+        metrics.finish_request(record, token, request.method, status, time.perf_counter() - start)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can also run async
+    WhiteNoise 6 is sync-only, and one sync middleware makes Django run
+    every request under ASGI, async views included, through a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_legacy_bookings(apps, schema_editor):
+    """Resolve the old title/seat id/username columns into foreign keys"""
+    Booking = apps.get_model('bookings', 'Booking')
+    Movie = apps.get_model('bookings', 'Movie')
+    Seat = apps.get_model('bookings', 'Seat')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    movies = {movie.title: movie.pk for movie in Movie.objects.all()}
+    seats = set(Seat.objects.values_list('pk', flat=True))
+    users = dict(User.objects.values_list('username', 'pk'))
+
+    unresolved = []
+    for booking in Booking.objects.all():
+        booking.movie_id = movies.get(booking.movie_title)
+        booking.seat_id = booking.legacy_seat_id if booking.legacy_seat_id in seats else None
+        booking.user_id = users.get(booking.username)
+        if None in (booking.movie_id, booking.seat_id, booking.user_id):
+            unresolved.append(booking.pk)
+        else:
+            booking.save(update_fields=['movie', 'seat', 'user'])
+    # Bookings pointing at rows that no longer exist cannot be kept
+    Booking.objects.filter(pk__in=unresolved).delete()
+
+
+def unlink_legacy_bookings(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    for booking in Booking.objects.select_related('movie', 'user'):
+        booking.movie_title = booking.movie.title
+        booking.legacy_seat_id = booking.seat_id
+        booking.username = booking.user.get_username()
+        booking.save(update_fields=['movie_title', 'legacy_seat_id', 'username'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Showtime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='showtimes', to='bookings.movie')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SeatState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_status', models.BooleanField(default=False)),
+                ('seat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='states', to='bookings.seat')),
+                ('showtime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_states', to='bookings.showtime')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('showtime', 'seat'), name='unique_seat_state_per_showtime')],
+            },
+        ),
+        migrations.RenameField(
+            model_name='booking',
+            old_name='movie',
+            new_name='movie_title',
+        ),
+        migrations.RenameField(
+            model_name='booking',
+            old_name='seat',
+            new_name='legacy_seat_id',
+        ),
+        migrations.RenameField(
+            model_name='booking',
+            old_name='user',
+            new_name='username',
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='movie',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='bookings.movie'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='seat',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='bookings.seat'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='showtime',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='bookings.showtime'),
+        ),
+        migrations.RunPython(link_legacy_bookings, unlink_legacy_bookings),
+    ]
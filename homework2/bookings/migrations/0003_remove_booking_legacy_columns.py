@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # Kept apart from 0002 so PostgreSQL does not alter the table while the
+    # data migration still has deferred foreign key checks pending.
+
+    dependencies = [
+        ('bookings', '0002_showtime_seatstate_booking_foreign_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='booking',
+            name='movie_title',
+        ),
+        migrations.RemoveField(
+            model_name='booking',
+            name='legacy_seat_id',
+        ),
+        migrations.RemoveField(
+            model_name='booking',
+            name='username',
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='movie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='bookings.movie'),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='seat',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='bookings.seat'),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_seathold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showtime',
+            name='seat_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-id'], name='booking_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['movie', '-id'], name='booking_movie_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(condition=models.Q(('booking_status', False)), fields=['id'], name='seat_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(condition=models.Q(('booking_status', True)), fields=['id'], name='seat_booked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seathold',
+            index=models.Index(fields=['user', 'expires_at'], name='seathold_user_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seatstate',
+            index=models.Index(condition=models.Q(('booking_status', False)), fields=['showtime', 'seat'], name='seatstate_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seatstate',
+            index=models.Index(condition=models.Q(('booking_status', True)), fields=['showtime', 'seat'], name='seatstate_booked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='showtime',
+            index=models.Index(fields=['movie', 'starts_at'], name='showtime_movie_starts_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('showtime__isnull', False)), fields=('showtime', 'seat'), name='unique_booking_per_showtime_seat'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_booking_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Auditorium',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='column',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='is_accessible',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='is_premium',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='number',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='row',
+            field=models.CharField(blank=True, max_length=5),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='auditorium',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='seats', to='bookings.auditorium'),
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='auditorium',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='showtimes', to='bookings.auditorium'),
+        ),
+        migrations.AddConstraint(
+            model_name='seat',
+            constraint=models.UniqueConstraint(fields=('auditorium', 'row', 'number'), name='unique_seat_position'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_waitlist'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdmissionQueue',
+            fields=[
+                ('showtime', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='admission_queue', serialize=False, to='bookings.showtime')),
+                ('issued', models.PositiveIntegerField(default=0)),
+                ('admitted', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='admission_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Users admitted per minute; empty means no waiting room', null=True),
+        ),
+        migrations.CreateModel(
+            name='AdmissionTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('showtime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='admission_tickets', to='bookings.showtime')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='admission_tickets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('showtime', 'user'), name='unique_admission_ticket_per_user')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_admission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditorium',
+            name='cleaning_minutes',
+            field=models.PositiveIntegerField(default=15),
+        ),
+        migrations.AddIndex(
+            model_name='showtime',
+            index=models.Index(fields=['auditorium', 'starts_at'], name='showtime_auditorium_starts_idx'),
+        ),
+    ]
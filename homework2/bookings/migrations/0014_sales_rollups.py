@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0013_showtime_scheduling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShowtimeSales',
+            fields=[
+                ('showtime', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='bookings.showtime')),
+                ('sold', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='showtime_sales', to='bookings.movie')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sold', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='bookings.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'movie'], name='daily_sales_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('movie', 'day'), name='unique_daily_sales_per_movie')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models.sql import Query
+
+INDEX_NAME = 'movie_search_idx'
+
+
+def search_vector():
+    # Must match bookings.search.search_vector(), or searches can't use the index
+    return (
+        SearchVector('title', weight='A', config='english')
+        + SearchVector('description', weight='B', config='english')
+    )
+
+
+def create_search_index(apps, schema_editor):
+    """GIN index over the movies' weighted search vector, PostgreSQL only"""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    Movie = apps.get_model('bookings', 'Movie')
+    query = Query(Movie, alias_cols=False)
+    compiler = query.get_compiler(connection=connection)
+    sql, params = compiler.compile(search_vector().resolve_expression(query))
+    schema_editor.execute(
+        f'CREATE INDEX {schema_editor.quote_name(INDEX_NAME)} ON '
+        f'{schema_editor.quote_name(Movie._meta.db_table)} USING gin (({sql}))',
+        params,
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(INDEX_NAME)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0015_booking_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0016_movie_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('cancelled', 'Cancelled'), ('transferred', 'Transferred')], max_length=11)),
+                ('booking_id', models.IntegerField()),
+                ('user_id', models.IntegerField()),
+                ('from_user_id', models.IntegerField(blank=True, null=True)),
+                ('movie_id', models.IntegerField()),
+                ('showtime_id', models.IntegerField(blank=True, null=True)),
+                ('seat_id', models.IntegerField()),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ShowtimeOccupancy',
+            fields=[
+                ('showtime_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('booked', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookingHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField()),
+                ('booking_id', models.IntegerField()),
+                ('movie_id', models.IntegerField()),
+                ('showtime_id', models.IntegerField(blank=True, null=True)),
+                ('seat_id', models.IntegerField()),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('cancelled', 'Cancelled'), ('transferred', 'Transferred')], default='active', max_length=11)),
+                ('booked_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_id', '-booked_at'], name='history_user_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('booking_id', 'user_id'), name='unique_history_per_booking_user')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0017_booking_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingevent',
+            name='transaction_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='projectioncheckpoint',
+            name='transaction_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='bookingevent',
+            index=models.Index(fields=['transaction_id', 'id'], name='bookingevent_position_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0018_booking_event_positions'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailysales',
+            name='unique_daily_sales_per_movie',
+        ),
+        migrations.AddField(
+            model_name='dailysales',
+            name='slot',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='dailysales',
+            constraint=models.UniqueConstraint(fields=('movie', 'day', 'slot'), name='unique_daily_sales_slot'),
+        ),
+    ]
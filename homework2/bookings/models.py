@@ -1,4 +1,7 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 
 # Create your models here.
 class Movie(models.Model):
@@ -6,22 +9,437 @@ class Movie(models.Model):
     description = models.TextField()
     release_date = models.DateField()
     duration = models.IntegerField(help_text="Duration in minutes")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
 
+class Auditorium(models.Model):
+    """A screen whose seats are laid out by an imported layout"""
+    name = models.CharField(max_length=100, unique=True)
+    # Kept free after every showtime when scheduling
+    cleaning_minutes = models.PositiveIntegerField(default=15)
+
+    def __str__(self):
+        return self.name
+
 class Seat(models.Model):
     seat_number = models.CharField(max_length=10)
+    # Legacy theater-wide flag; per-showtime availability lives in SeatState
     booking_status = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Position in an imported auditorium layout; blank for legacy seats
+    auditorium = models.ForeignKey(
+        Auditorium, on_delete=models.CASCADE, related_name='seats', null=True, blank=True
+    )
+    row = models.CharField(max_length=5, blank=True)
+    number = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Horizontal position counting aisles as gaps, so seats are side by
+    # side exactly when their columns are consecutive
+    column = models.PositiveSmallIntegerField(null=True, blank=True)
+    is_accessible = models.BooleanField(default=False)
+    is_premium = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['auditorium', 'row', 'number'], name='unique_seat_position'),
+        ]
+        indexes = [
+            # Partial indexes for the legacy available/booked seat lists
+            models.Index(fields=['id'], condition=Q(booking_status=False), name='seat_available_idx'),
+            models.Index(fields=['id'], condition=Q(booking_status=True), name='seat_booked_idx'),
+        ]
 
     def __str__(self):
         return f"Seat {self.seat_number}"
 
+class ShowtimeQuerySet(models.QuerySet):
+    def bump_seat_version(self):
+        """
+        Record that the seat map changed
+        Run it as the last statement of a write so the row lock is brief.
+        """
+        return self.update(seat_version=F('seat_version') + 1)
+
+class Showtime(models.Model):
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='showtimes')
+    starts_at = models.DateTimeField()
+    # Without an auditorium a showtime is sold against every seat
+    auditorium = models.ForeignKey(
+        Auditorium, on_delete=models.CASCADE, related_name='showtimes', null=True, blank=True
+    )
+    # Increases on every seat map change so clients can tell stale copies
+    seat_version = models.PositiveIntegerField(default=0)
+    # Set during an on-sale to send bookings through the waiting room
+    admission_rate = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Users admitted per minute; empty means no waiting room"
+    )
+
+    objects = ShowtimeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['movie', 'starts_at'], name='showtime_movie_starts_idx'),
+            models.Index(fields=['auditorium', 'starts_at'], name='showtime_auditorium_starts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie.title} - {self.starts_at:%Y-%m-%d %H:%M}"
+
+class SeatHoldQuerySet(models.QuerySet):
+    def active(self, now=None):
+        return self.filter(expires_at__gt=now or timezone.now())
+
+    def expire(self, now=None):
+        """
+        Release every expired hold back into inventory in bulk
+        Returns the number of seats released.
+        """
+        from .realtime import seat_map_changed
+        from .waitlist import reserve_for_waitlist
+
+        now = now or timezone.now()
+        # A lapsed hold's seat may have been booked since; leave it sold
+        expired = SeatState.objects.filter(held_until__lte=now, booking_status=False)
+        released_seats = {}
+        for showtime_id, seat_id in expired.values_list('showtime_id', 'seat_id'):
+            released_seats.setdefault(showtime_id, []).append(seat_id)
+        with transaction.atomic():
+            released = expired.update(hold=None, held_until=None)
+            self.filter(expires_at__lte=now).delete()
+            for showtime_id, seat_ids in released_seats.items():
+                if not reserve_for_waitlist(showtime_id, seat_ids, now):
+                    seat_map_changed(showtime_id, available=seat_ids)
+        return released
+
+class SeatHold(models.Model):
+    """Seats reserved for a user while they pay"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='seat_holds')
+    showtime = models.ForeignKey(Showtime, on_delete=models.CASCADE, related_name='holds')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = SeatHoldQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'expires_at'], name='seathold_user_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Hold {self.pk} - {self.user.username}"
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self, now=None):
+        return self.filter(expires_at__lte=now or timezone.now())
+
+class IdempotencyKey(models.Model):
+    """The stored response to a write sent with an Idempotency-Key header"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    # sha256 of the method, path and body the key was first used with
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} - {self.user.username}"
+
+class SeatStateQuerySet(models.QuerySet):
+    def available(self, now=None):
+        """Seats that are neither booked nor under an unexpired hold"""
+        return self.filter(booking_status=False).filter(
+            Q(held_until__isnull=True) | Q(held_until__lte=now or timezone.now())
+        )
+
+    def booked(self):
+        return self.filter(booking_status=True)
+
+    def create_for(self, showtimes, seats):
+        """Create the missing seat states for every showtime/seat pair"""
+        return self.bulk_create(
+            [SeatState(showtime=showtime, seat=seat) for showtime in showtimes for seat in seats],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+class SeatState(models.Model):
+    """Booking status of one seat for one showtime"""
+    showtime = models.ForeignKey(Showtime, on_delete=models.CASCADE, related_name='seat_states')
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE, related_name='states')
+    booking_status = models.BooleanField(default=False)
+    hold = models.ForeignKey(
+        SeatHold, on_delete=models.SET_NULL, related_name='seat_states', null=True, blank=True
+    )
+    # Copy of hold.expires_at so availability and expiry never need a join
+    held_until = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = SeatStateQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['showtime', 'seat'], name='unique_seat_state_per_showtime'),
+        ]
+        indexes = [
+            # Only the rows the available/booked lists read for a showtime
+            models.Index(
+                fields=['showtime', 'seat'], condition=Q(booking_status=False), name='seatstate_available_idx'
+            ),
+            models.Index(
+                fields=['showtime', 'seat'], condition=Q(booking_status=True), name='seatstate_booked_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.showtime} - Seat {self.seat.seat_number}"
+
 class Booking(models.Model):
-    movie = models.CharField(max_length=200)
-    seat = models.IntegerField()
-    user = models.CharField()
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='bookings')
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE, related_name='bookings')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings')
+    showtime = models.ForeignKey(
+        Showtime, on_delete=models.CASCADE, related_name='bookings', null=True, blank=True
+    )
     booking_date = models.DateField()
+    # What the seat was sold for; empty for bookings made before pricing
+    price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            # A seat can be booked once per showtime, whatever the application does
+            models.UniqueConstraint(
+                fields=['showtime', 'seat'],
+                condition=Q(showtime__isnull=False),
+                name='unique_booking_per_showtime_seat',
+            ),
+        ]
+        indexes = [
+            # Booking lists are cursor paginated newest first by id
+            models.Index(fields=['user', '-id'], name='booking_user_recent_idx'),
+            models.Index(fields=['movie', '-id'], name='booking_movie_recent_idx'),
+            models.Index(fields=['booking_date', 'id'], name='booking_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.movie.title} - Seat {self.seat.seat_number}"
+
+class WaitlistEntryQuerySet(models.QuerySet):
+    def waiting(self):
+        return self.filter(status=WaitlistEntry.WAITING)
+
+    def active(self):
+        return self.filter(status__in=[WaitlistEntry.WAITING, WaitlistEntry.OFFERED])
+
+class WaitlistEntry(models.Model):
+    """A user queued for the next seat freed up at a sold-out showtime"""
+    WAITING = 'waiting'
+    OFFERED = 'offered'
+    ACCEPTED = 'accepted'
+    DECLINED = 'declined'
+    EXPIRED = 'expired'
+    LEFT = 'left'
+    STATUS_CHOICES = [
+        (WAITING, 'Waiting'),
+        (OFFERED, 'Offered'),
+        (ACCEPTED, 'Accepted'),
+        (DECLINED, 'Declined'),
+        (EXPIRED, 'Expired'),
+        (LEFT, 'Left'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='waitlist_entries')
+    showtime = models.ForeignKey(Showtime, on_delete=models.CASCADE, related_name='waitlist_entries')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=WAITING)
+    # The hold a freed seat is offered through; confirming it books the seat
+    hold = models.OneToOneField(
+        SeatHold, on_delete=models.SET_NULL, related_name='waitlist_entry', null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WaitlistEntryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'showtime'],
+                condition=Q(status__in=['waiting', 'offered']),
+                name='unique_active_waitlist_entry',
+            ),
+        ]
+        indexes = [
+            # Entries are served first come first served per showtime
+            models.Index(fields=['showtime', 'id'], condition=Q(status='waiting'), name='waitlist_queue_idx'),
+            models.Index(fields=['user', '-id'], name='waitlist_user_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.showtime} ({self.status})"
+
+class WaitlistRelease(models.Model):
+    """A freed seat reserved for the waitlist, queued for the waitlist worker"""
+    showtime = models.ForeignKey(Showtime, on_delete=models.CASCADE, related_name='waitlist_releases')
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE, related_name='waitlist_releases')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.showtime} - Seat {self.seat_id}"
+
+class AdmissionQueue(models.Model):
+    """Waiting room counters of one showtime"""
+    showtime = models.OneToOneField(
+        Showtime, on_delete=models.CASCADE, primary_key=True, related_name='admission_queue'
+    )
+    # Tickets handed out so far, and how many of them have been let in
+    # (fractional: admission accrues continuously at the showtime's rate)
+    issued = models.PositiveIntegerField(default=0)
+    admitted = models.FloatField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.showtime} - {self.issued} in queue"
+
+class AdmissionTicket(models.Model):
+    """A user's place in a showtime's waiting room"""
+    showtime = models.ForeignKey(Showtime, on_delete=models.CASCADE, related_name='admission_tickets')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='admission_tickets')
+    number = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['showtime', 'user'], name='unique_admission_ticket_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.showtime} - #{self.number} {self.user.username}"
+
+class ShowtimeSales(models.Model):
+    """Seats sold for a showtime, kept current by every booking write"""
+    showtime = models.OneToOneField(Showtime, on_delete=models.CASCADE, primary_key=True, related_name='sales')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='showtime_sales')
+    sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.showtime_id}: {self.sold} sold"
+
+class DailySales(models.Model):
+    """Seats sold for a movie on one day (the booking date), in one of a few slots"""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    # Showtimes of a movie write to different slots so they don't queue on
+    # one row; reports sum the slots
+    slot = models.PositiveSmallIntegerField(default=0)
+    sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'day', 'slot'], name='unique_daily_sales_slot'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'movie'], name='daily_sales_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} on {self.day} (slot {self.slot}): {self.sold} sold"
+
+class BookingEvent(models.Model):
+    """One create, cancel or transfer of a booking; rows are never changed"""
+    CREATED = 'created'
+    CANCELLED = 'cancelled'
+    TRANSFERRED = 'transferred'
+    KIND_CHOICES = [
+        (CREATED, 'Created'),
+        (CANCELLED, 'Cancelled'),
+        (TRANSFERRED, 'Transferred'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=11, choices=KIND_CHOICES)
+    # Plain ids rather than foreign keys: the log outlives the rows
+    booking_id = models.IntegerField()
+    user_id = models.IntegerField()
+    # The previous owner of a transferred booking
+    from_user_id = models.IntegerField(null=True, blank=True)
+    movie_id = models.IntegerField()
+    showtime_id = models.IntegerField(null=True, blank=True)
+    seat_id = models.IntegerField()
+    price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    # PostgreSQL id of the writing transaction (0 elsewhere); the log is
+    # read in (transaction_id, id) order
+    transaction_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction_id', 'id'], name='bookingevent_position_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} booking {self.booking_id} {self.kind}"
+
+class ProjectionCheckpoint(models.Model):
+    """Position of the last booking event a projection has applied"""
+    name = models.CharField(max_length=50, primary_key=True)
+    transaction_id = models.BigIntegerField(default=0)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.transaction_id}-{self.position}"
+
+class ShowtimeOccupancy(models.Model):
+    """Seats booked and cancelled per showtime, projected from the event log"""
+    showtime_id = models.IntegerField(primary_key=True)
+    booked = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.showtime_id}: {self.booked} booked"
+
+class BookingHistory(models.Model):
+    """A booking as one user has held it, projected from the event log"""
+    ACTIVE = 'active'
+    CANCELLED = 'cancelled'
+    TRANSFERRED = 'transferred'
+    STATUS_CHOICES = [
+        (ACTIVE, 'Active'),
+        (CANCELLED, 'Cancelled'),
+        (TRANSFERRED, 'Transferred'),
+    ]
+
+    user_id = models.IntegerField()
+    booking_id = models.IntegerField()
+    movie_id = models.IntegerField()
+    showtime_id = models.IntegerField(null=True, blank=True)
+    seat_id = models.IntegerField()
+    price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    status = models.CharField(max_length=11, choices=STATUS_CHOICES, default=ACTIVE)
+    # When the user got the booking, and when it last changed
+    booked_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['booking_id', 'user_id'], name='unique_history_per_booking_user'),
+        ]
+        indexes = [
+            models.Index(fields=['user_id', '-booked_at'], name='history_user_recent_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.movie.title} - Seat {self.seat.seat_number}"
\ No newline at end of file
+        return f"{self.user_id} - booking {self.booking_id} ({self.status})"
@@ -0,0 +1,31 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class BookingCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the primary key, newest bookings first.
+    Each page is an index range scan, so page 10,000 costs the same as page 1.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class SeatCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the primary key in seat map order.
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class MovieSearchPagination(LimitOffsetPagination):
+    """
+    Offset pagination for search results, which are ordered by relevance
+    rather than a unique key. Pages are small for typeahead.
+    """
+    default_limit = 20
+    max_limit = 100
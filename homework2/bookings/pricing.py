@@ -0,0 +1,144 @@
+"""
+Demand-based ticket pricing.
+
+A seat's price is BOOKINGS_PRICING's base price times three multipliers:
+its zone (premium seats cost more), the band of the day the showtime
+starts in, and the showtime's occupancy tier, which goes up as seats sell.
+
+price_table() works out every seat's price for a showtime. The seat zones
+and start time are cached, so pricing a basket reads one row: the
+showtime's seats sold from ShowtimeSales, which picks the tier. Bookings
+read it with the row locked inside their transaction, so the price they
+record is the one of the tier the showtime is in when they commit, in
+every worker, without waiting on any cache invalidation.
+"""
+import math
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.http import Http404
+from django.utils import timezone
+
+from .cache import SEATS_SCOPE, pricing_scope, read_through
+from .models import SeatState, Showtime, ShowtimeSales
+
+CENT = Decimal('0.01')
+
+
+def seat_zone(is_premium):
+    return 'premium' if is_premium else 'standard'
+
+
+def time_of_day_multiplier(starts_at):
+    """
+    Multiplier of the band of the day a showtime starts in
+    """
+    start = timezone.localtime(starts_at).time()
+    multiplier = Decimal('1')
+    for band_start, band_multiplier in settings.BOOKINGS_PRICING['TIME_OF_DAY']:
+        if start >= band_start:
+            multiplier = band_multiplier
+    return multiplier
+
+
+def occupancy_tier(sold, capacity):
+    """
+    (tier, multiplier, sold_from, sold_to) for `sold` of `capacity` seats
+    The tier holds while sold_from <= sold < sold_to; the top tier has no
+    sold_to.
+    """
+    tiers = settings.BOOKINGS_PRICING['OCCUPANCY']
+    percent = 100 * sold / capacity if capacity else 0
+    tier = 0
+    for index, (threshold, _) in enumerate(tiers):
+        if percent >= threshold:
+            tier = index
+    sold_from = math.ceil(tiers[tier][0] * capacity / 100)
+    sold_to = math.ceil(tiers[tier + 1][0] * capacity / 100) if tier + 1 < len(tiers) else None
+    return tier, tiers[tier][1], sold_from, sold_to
+
+
+def zone_prices(starts_at, tier_multiplier):
+    pricing = settings.BOOKINGS_PRICING
+    base = pricing['BASE_PRICE'] * time_of_day_multiplier(starts_at) * tier_multiplier
+    return {
+        zone: str((base * multiplier).quantize(CENT, rounding=ROUND_HALF_UP))
+        for zone, multiplier in pricing['ZONES'].items()
+    }
+
+
+def build_seat_layout(showtime_id):
+    starts_at = Showtime.objects.filter(pk=showtime_id).values_list('starts_at', flat=True).first()
+    if starts_at is None:
+        raise Http404("No showtime matches the given query.")
+    seat_zones = {
+        seat_id: seat_zone(is_premium)
+        for seat_id, is_premium in SeatState.objects.filter(showtime_id=showtime_id)
+        .values_list('seat_id', 'seat__is_premium')
+    }
+    return {'starts_at': starts_at, 'seat_zones': seat_zones}
+
+
+def seat_layout(showtime_id):
+    """
+    A showtime's start and every seat's zone, cached
+    """
+    return read_through(
+        'seat_layout', [pricing_scope(showtime_id), SEATS_SCOPE], lambda: (build_seat_layout(showtime_id), None)
+    )
+
+
+def seats_sold(showtime_id, lock=False):
+    """
+    Seats sold for a showtime; lock=True locks its ShowtimeSales row
+    """
+    sales = ShowtimeSales.objects.filter(showtime_id=showtime_id)
+    if lock:
+        sales = sales.select_for_update()
+    return sales.values_list('sold', flat=True).first() or 0
+
+
+def price_table(showtime_id, lock=False):
+    """
+    Zone prices and every seat's zone for a showtime at its current tier
+    """
+    showtime_id = int(showtime_id)
+    layout = seat_layout(showtime_id)
+    tier, multiplier, _, _ = occupancy_tier(seats_sold(showtime_id, lock), len(layout['seat_zones']))
+    return {
+        'showtime': showtime_id,
+        'tier': tier,
+        'prices': zone_prices(layout['starts_at'], multiplier),
+        'seat_zones': layout['seat_zones'],
+    }
+
+
+def quote(showtime_id, seat_ids):
+    """
+    Price a basket of seats
+    Returns (quote, unknown seat ids); the quote is None if any seat is
+    not part of the showtime.
+    """
+    table = price_table(showtime_id)
+    unknown = [seat_id for seat_id in seat_ids if seat_id not in table['seat_zones']]
+    if unknown:
+        return None, unknown
+    seats = []
+    total = Decimal('0')
+    for seat_id in seat_ids:
+        zone = table['seat_zones'][seat_id]
+        price = table['prices'][zone]
+        total += Decimal(price)
+        seats.append({'seat': seat_id, 'zone': zone, 'price': price})
+    return {'showtime': table['showtime'], 'tier': table['tier'], 'seats': seats, 'total': str(total)}, []
+
+
+def seat_prices(showtime_id, seat_ids):
+    """
+    {seat id: Decimal price} to record on new bookings
+    Call inside the booking transaction: the sold count is read with its
+    row locked until the rollups add these seats to it, so concurrent
+    bookings of a showtime are priced one after the other.
+    """
+    table = price_table(showtime_id, lock=True)
+    return {seat_id: Decimal(table['prices'][table['seat_zones'][seat_id]]) for seat_id in seat_ids}
@@ -0,0 +1,170 @@
+"""
+Push seat map changes to connected clients.
+
+Writes call seat_map_changed() inside their transaction; once it commits,
+the change is published to the broker backend configured by
+SEAT_EVENTS_BACKEND. Each /api/showtimes/{id}/stream/ connection subscribes
+to its showtime, receives a snapshot and then a stream of deltas.
+"""
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import best_available
+from .cache import bump_on_commit, showtime_scope
+from .models import Showtime
+from .seatmap import showtime_availability
+
+
+class InMemoryBackend:
+    """
+    Fan messages out to subscribers in this process
+
+    Each subscriber gets a bounded asyncio queue. A subscriber that falls
+    too far behind gets a None message, meaning "drop your state and resync".
+    """
+    queue_size = 256
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, topic):
+        queue = asyncio.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, topic, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(topic, set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(topic, None)
+
+    def publish(self, topic, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, message)
+            except RuntimeError:
+                # The subscriber's event loop is gone
+                self.unsubscribe(topic, queue)
+
+    @staticmethod
+    def _deliver(queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(settings.SEAT_EVENTS_BACKEND)()
+        return _backend
+
+
+def showtime_topic(showtime_id):
+    return f'showtime:{showtime_id}'
+
+
+def seat_map_changed(showtime_id, available=(), unavailable=()):
+    """
+    Bump the showtime's seat version, then publish the change and
+    invalidate cached availability after commit
+    Call it last inside the transaction that changed the seats.
+    """
+    Showtime.objects.filter(pk=showtime_id).bump_seat_version()
+    version = Showtime.objects.filter(pk=showtime_id).values_list('seat_version', flat=True).get()
+    message = {
+        'version': version,
+        'available': sorted(available),
+        'unavailable': sorted(unavailable),
+    }
+    transaction.on_commit(lambda: get_backend().publish(showtime_topic(showtime_id), message))
+    transaction.on_commit(
+        lambda: best_available.seat_map_applied(showtime_id, version, available, unavailable)
+    )
+    bump_on_commit(showtime_scope(showtime_id))
+    return version
+
+
+def showtime_snapshot(showtime_id):
+    """
+    Version and availability bitset, read in that order
+
+    Reading the version first means a change that lands in between shows up
+    both in the bitset and as a later delta, which is harmless because deltas
+    carry absolute seat states.
+    """
+    showtime = Showtime.objects.get(pk=showtime_id)
+    count, bitmap = showtime_availability(showtime)
+    return {'version': showtime.seat_version, 'seats': count, 'available': bitmap}
+
+
+def fresh_changes(message, floor, seen):
+    """
+    Keep only the seat changes the client has not seen yet
+
+    Publishes from different request threads can arrive out of order, so
+    the newest version is tracked per seat rather than per stream.
+    """
+    version = message['version']
+    if version <= floor:
+        return None
+    delta = {'version': version}
+    for key in ('available', 'unavailable'):
+        delta[key] = [seat_id for seat_id in message[key] if seen.get(seat_id, floor) < version]
+        seen.update((seat_id, version) for seat_id in delta[key])
+    if not delta['available'] and not delta['unavailable']:
+        return None
+    return delta
+
+
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def seat_events(showtime_id, heartbeat=15):
+    """
+    Server-sent events for one showtime: a snapshot, then deltas
+    """
+    backend = get_backend()
+    topic = showtime_topic(showtime_id)
+    queue = backend.subscribe(topic)
+    try:
+        snapshot = await sync_to_async(showtime_snapshot)(showtime_id)
+        floor, seen = snapshot['version'], {}
+        yield sse_event('snapshot', snapshot)
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if message is None:
+                # We fell behind and lost deltas; start over from a snapshot
+                snapshot = await sync_to_async(showtime_snapshot)(showtime_id)
+                floor, seen = snapshot['version'], {}
+                yield sse_event('snapshot', snapshot)
+                continue
+            delta = fresh_changes(message, floor, seen)
+            if delta:
+                yield sse_event('delta', delta)
+    finally:
+        backend.unsubscribe(topic, queue)
@@ -0,0 +1,212 @@
+"""
+Sales rollups for reporting.
+
+ShowtimeSales counts the seats sold (and revenue) per showtime and
+DailySales per movie and booking date. Every booking write adjusts them in its own transaction
+with record_bookings(), so reports read a row or a few per line instead
+of counting bookings. Rows are bumped with `sold = sold + n` at the end
+of the write, just before its events are logged, which keeps their row
+locks short.
+
+A movie's day is split over DAILY_SLOTS rows picked by showtime, so
+bookings for different showtimes of a hit don't all wait on one row;
+reports sum the slots.
+
+Writes that go around the API (admin edits, seeding, deleting users)
+leave the rollups behind; `python manage.py reconcile_sales` rebuilds
+them from the bookings.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, Mod
+
+from . import pricing
+from .models import Booking, DailySales, ShowtimeSales
+
+BATCH_SIZE = 1000
+# DailySales rows per movie and day
+DAILY_SLOTS = 8
+
+
+def daily_slot(showtime_id):
+    return (showtime_id or 0) % DAILY_SLOTS
+
+
+def record_bookings(bookings, sign=1):
+    """
+    Add bookings to the rollups, or take them away with sign=-1
+    Call inside the transaction that created or deleted the bookings.
+    """
+    by_showtime = Counter()
+    movies = {}
+    by_day = Counter()
+    revenue = Counter()
+    for booking in bookings:
+        price = booking.price or Decimal('0')
+        if booking.showtime_id is not None:
+            by_showtime[booking.showtime_id] += 1
+            revenue[booking.showtime_id] += price
+            movies[booking.showtime_id] = booking.movie_id
+        day = booking.movie_id, booking.booking_date, daily_slot(booking.showtime_id)
+        by_day[day] += 1
+        revenue[day] += price
+
+    # Make sure the rows exist, then bump them; two statements, but safe
+    # against a concurrent first booking of the same showtime or day
+    ShowtimeSales.objects.bulk_create([
+        ShowtimeSales(showtime_id=showtime_id, movie_id=movies[showtime_id]) for showtime_id in by_showtime
+    ], ignore_conflicts=True)
+    DailySales.objects.bulk_create([
+        DailySales(movie_id=movie_id, day=day, slot=slot) for movie_id, day, slot in by_day
+    ], ignore_conflicts=True)
+    # Sorted so concurrent writes lock rows in the same order
+    for showtime_id, count in sorted(by_showtime.items()):
+        ShowtimeSales.objects.filter(showtime_id=showtime_id).update(
+            sold=F('sold') + sign * count, revenue=F('revenue') + sign * revenue[showtime_id]
+        )
+    for (movie_id, day, slot), count in sorted(by_day.items()):
+        DailySales.objects.filter(movie_id=movie_id, day=day, slot=slot).update(
+            sold=F('sold') + sign * count, revenue=F('revenue') + sign * revenue[movie_id, day, slot]
+        )
+
+
+def lock_rollups():
+    """
+    Hold off booking writes' rollup updates until the transaction ends
+    Writes already past their update hold its row locks, so this also
+    waits for them to commit. SQLite locks the whole database on write
+    anyway.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {ShowtimeSales._meta.db_table}, {DailySales._meta.db_table} '
+                'IN SHARE ROW EXCLUSIVE MODE'
+            )
+
+
+def expected_rollups():
+    """
+    Rollup values computed from the bookings:
+    ({showtime: (movie, sold, revenue)}, {(movie, day, slot): (sold, revenue)})
+    """
+    revenue = Coalesce(Sum('price'), Value(Decimal('0')))
+    showtimes = {
+        showtime_id: (movie_id, sold, total)
+        for showtime_id, movie_id, sold, total in Booking.objects.filter(showtime__isnull=False)
+        .values_list('showtime_id', 'movie_id').annotate(sold=Count('id'), total=revenue).order_by()
+    }
+    days = {
+        (movie_id, day, slot): (sold, total)
+        for movie_id, day, slot, sold, total in Booking.objects
+        .annotate(slot=Mod(Coalesce('showtime_id', Value(0)), Value(DAILY_SLOTS)))
+        .values_list('movie_id', 'booking_date', 'slot').annotate(sold=Count('id'), total=revenue).order_by()
+    }
+    return showtimes, days
+
+
+def reconcile(dry_run=False):
+    """
+    Rebuild the rollups from the bookings in one transaction
+    Returns how many showtime and day rows were wrong (or missing).
+    Rows with nothing sold are dropped. A dry run only counts.
+    """
+    with transaction.atomic():
+        if not dry_run:
+            lock_rollups()
+        showtimes, days = expected_rollups()
+        current_showtimes = {
+            showtime_id: (movie_id, sold, total)
+            for showtime_id, movie_id, sold, total in ShowtimeSales.objects.filter(sold__gt=0)
+            .values_list('showtime_id', 'movie_id', 'sold', 'revenue')
+        }
+        current_days = {
+            (movie_id, day, slot): (sold, total)
+            for movie_id, day, slot, sold, total in DailySales.objects.filter(sold__gt=0)
+            .values_list('movie_id', 'day', 'slot', 'sold', 'revenue')
+        }
+        result = {
+            'showtimes': sum(
+                current_showtimes.get(key) != value for key, value in showtimes.items()
+            ) + len(current_showtimes.keys() - showtimes.keys()),
+            'days': sum(
+                current_days.get(key) != value for key, value in days.items()
+            ) + len(current_days.keys() - days.keys()),
+        }
+        if dry_run or not any(result.values()):
+            return result
+        ShowtimeSales.objects.all().delete()
+        DailySales.objects.all().delete()
+        ShowtimeSales.objects.bulk_create([
+            ShowtimeSales(showtime_id=showtime_id, movie_id=movie_id, sold=sold, revenue=total)
+            for showtime_id, (movie_id, sold, total) in showtimes.items()
+        ], batch_size=BATCH_SIZE)
+        DailySales.objects.bulk_create([
+            DailySales(movie_id=movie_id, day=day, slot=slot, sold=sold, revenue=total)
+            for (movie_id, day, slot), (sold, total) in days.items()
+        ], batch_size=BATCH_SIZE)
+    return result
+
+
+def sold_on(rows, start=None, end=None, movie=None, day='day'):
+    if start:
+        rows = rows.filter(**{f'{day}__gte': start})
+    if end:
+        rows = rows.filter(**{f'{day}__lte': end})
+    if movie:
+        rows = rows.filter(movie_id=movie)
+    return rows
+
+
+def summed(rows, *fields, **expressions):
+    """
+    Sold and revenue summed over the slots of each group; empty groups are dropped
+    """
+    totals = rows.values(*fields, **expressions).annotate(
+        total_sold=Sum('sold'), total_revenue=Sum('revenue')
+    ).filter(total_sold__gt=0)
+    keys = (*fields, *expressions)
+    return [
+        {**{key: row[key] for key in keys}, 'sold': row['total_sold'], 'revenue': row['total_revenue']}
+        for row in totals
+    ]
+
+
+def with_money(rows):
+    # Decimals as strings with cents, like the prices they add up
+    for row in rows:
+        row['revenue'] = str(row['revenue'].quantize(pricing.CENT))
+    return rows
+
+
+def daily_report(start=None, end=None, movie=None):
+    """
+    Seats sold and revenue per movie and day, summed over its slots
+    """
+    rows = sold_on(DailySales.objects.all(), start, end, movie).order_by('day', 'movie')
+    return with_money(summed(rows, 'day', 'movie', title=F('movie__title')))
+
+
+def movie_report(start=None, end=None, movie=None):
+    """
+    Seats sold and revenue per movie, summed over the daily rows in range
+    """
+    rows = sold_on(DailySales.objects.all(), start, end, movie).order_by('movie')
+    return with_money(summed(rows, 'movie', title=F('movie__title')))
+
+
+def showtime_report(start=None, end=None, movie=None):
+    """
+    Seats sold and revenue per showtime, filtered on the day it starts
+    """
+    rows = sold_on(ShowtimeSales.objects.all(), start, end, movie, day='showtime__starts_at__date')
+    rows = rows.filter(sold__gt=0)
+    return with_money(list(
+        rows.order_by('showtime__starts_at', 'showtime_id')
+        .values(
+            'showtime', 'movie', 'sold', 'revenue', title=F('movie__title'), starts_at=F('showtime__starts_at')
+        )
+    ))
@@ -0,0 +1,241 @@
+"""
+Showtime scheduling.
+
+A showtime occupies its auditorium from starts_at until the movie's
+duration plus the auditorium's cleaning_minutes later. Proposed showtimes
+are checked against an IntervalIndex of each auditorium's occupied
+intervals, loaded with one query however many showtimes a batch proposes.
+The index is sorted by start, so a check bisects to the few intervals that
+could overlap instead of comparing every pair.
+
+Schedules are written in one transaction with the auditoriums locked, so
+two batches for the same auditorium can't both pass the check.
+"""
+import math
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Auditorium, Movie, Seat, SeatState, Showtime
+
+# Generated showtimes start on the hour, five past, ten past, ...
+START_STEP_MINUTES = 5
+DAYS_PER_WEEK = 7
+# Most showtimes one request may propose
+MAX_PROPOSALS = 10000
+
+
+def round_up(moment, minutes=START_STEP_MINUTES):
+    step = minutes * 60
+    return datetime.fromtimestamp(math.ceil(moment.timestamp() / step) * step, tz=moment.tzinfo)
+
+
+def occupied_until(starts_at, duration, auditorium):
+    return starts_at + timedelta(minutes=duration + auditorium.cleaning_minutes)
+
+
+class IntervalIndex:
+    """Occupied [start, end) intervals of one auditorium, sorted by start"""
+
+    def __init__(self):
+        self.starts = []
+        self.intervals = []
+        self.longest = timedelta(0)
+
+    def add(self, start, end, key):
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.intervals.insert(position, (start, end, key))
+        self.longest = max(self.longest, end - start)
+
+    def overlapping(self, start, end):
+        """
+        Intervals overlapping [start, end)
+        Only intervals starting less than the longest interval before
+        `start` can reach it, so just that window of the index is read.
+        """
+        low = bisect_right(self.starts, start - self.longest)
+        high = bisect_left(self.starts, end)
+        return [interval for interval in self.intervals[low:high] if interval[1] > start]
+
+    def next_free(self, start, length):
+        """
+        Earliest rounded start at or after `start` with `length` free
+        """
+        while True:
+            start = round_up(start)
+            blocking = self.overlapping(start, start + length)
+            if not blocking:
+                return start
+            start = max(end for _, end, _ in blocking)
+
+
+class Schedule:
+    """Interval indexes of the auditoriums a batch touches"""
+
+    def __init__(self, auditoriums):
+        self.auditoriums = auditoriums
+        self.indexes = {auditorium_id: IntervalIndex() for auditorium_id in auditoriums}
+
+    @classmethod
+    def load(cls, auditorium_ids, start, end, lock=False):
+        """
+        Index the showtimes occupying these auditoriums between start and end
+        With `lock` the auditoriums are locked until the transaction ends.
+        """
+        auditoriums = Auditorium.objects.filter(pk__in=set(auditorium_ids)).order_by('pk')
+        if lock:
+            auditoriums = auditoriums.select_for_update()
+        schedule = cls({auditorium.pk: auditorium for auditorium in auditoriums})
+        # A showtime starting this long before `start` may still be running
+        longest = Movie.objects.aggregate(longest=Max('duration'))['longest'] or 0
+        cleaning = max((auditorium.cleaning_minutes for auditorium in schedule.auditoriums.values()), default=0)
+        showtimes = Showtime.objects.filter(
+            auditorium_id__in=schedule.auditoriums,
+            starts_at__gt=start - timedelta(minutes=longest + cleaning),
+            starts_at__lt=end,
+        ).values_list('pk', 'auditorium_id', 'starts_at', 'movie__duration')
+        for pk, auditorium_id, starts_at, duration in showtimes:
+            schedule.add(auditorium_id, starts_at, duration, pk)
+        return schedule
+
+    def add(self, auditorium_id, starts_at, duration, key):
+        end = occupied_until(starts_at, duration, self.auditoriums[auditorium_id])
+        self.indexes[auditorium_id].add(starts_at, end, key)
+
+    def conflicts(self, auditorium_id, starts_at, duration):
+        """
+        Keys of the showtimes a proposed showtime would overlap
+        """
+        end = occupied_until(starts_at, duration, self.auditoriums[auditorium_id])
+        return [key for _, _, key in self.indexes[auditorium_id].overlapping(starts_at, end)]
+
+
+def proposal_window(proposals):
+    starts = [proposal['starts_at'] for proposal in proposals]
+    ends = [
+        occupied_until(proposal['starts_at'], proposal['movie'].duration, proposal['auditorium'])
+        for proposal in proposals
+    ]
+    return min(starts), max(ends)
+
+
+def check_proposals(proposals, lock=False):
+    """
+    Conflicts of proposed showtimes with existing ones and each other
+    Proposals are dicts of movie, auditorium and starts_at. Returns one
+    {"index", "showtimes", "proposed"} dict per proposal that overlaps an
+    existing showtime or an earlier proposal, listing what it overlaps.
+    """
+    start, end = proposal_window(proposals)
+    schedule = Schedule.load([proposal['auditorium'].pk for proposal in proposals], start, end, lock)
+    conflicts = []
+    for position, proposal in enumerate(proposals):
+        args = (proposal['auditorium'].pk, proposal['starts_at'], proposal['movie'].duration)
+        keys = schedule.conflicts(*args)
+        if keys:
+            conflicts.append({
+                'index': position,
+                'showtimes': sorted(key for key in keys if isinstance(key, int)),
+                'proposed': sorted(key[1] for key in keys if isinstance(key, tuple)),
+            })
+        schedule.add(*args, ('proposed', position))
+    return conflicts
+
+
+def showtime_conflicts(movie, auditorium, starts_at, exclude=None):
+    """
+    Ids of the showtimes one showtime would overlap
+    """
+    proposal = {'movie': movie, 'auditorium': auditorium, 'starts_at': starts_at}
+    start, end = proposal_window([proposal])
+    schedule = Schedule.load([auditorium.pk], start, end)
+    return [key for key in schedule.conflicts(auditorium.pk, starts_at, movie.duration) if key != exclude]
+
+
+def create_showtimes(proposals):
+    """
+    Insert showtimes with their seat maps in bulk
+    Call inside the transaction that checked them.
+    """
+    showtimes = Showtime.objects.bulk_create([
+        Showtime(movie=proposal['movie'], auditorium=proposal['auditorium'], starts_at=proposal['starts_at'])
+        for proposal in proposals
+    ], batch_size=1000)
+    seats = {}
+    for seat in Seat.objects.filter(auditorium_id__in={showtime.auditorium_id for showtime in showtimes}):
+        seats.setdefault(seat.auditorium_id, []).append(seat)
+    by_auditorium = {}
+    for showtime in showtimes:
+        by_auditorium.setdefault(showtime.auditorium_id, []).append(showtime)
+    for auditorium_id, auditorium_showtimes in by_auditorium.items():
+        SeatState.objects.create_for(auditorium_showtimes, seats.get(auditorium_id, []))
+    return showtimes
+
+
+def schedule_showtimes(proposals, dry_run=False):
+    """
+    Create proposed showtimes all together, or none if any conflicts
+    Returns (showtimes, conflicts); showtimes is empty on a dry run.
+    """
+    with transaction.atomic():
+        conflicts = check_proposals(proposals, lock=not dry_run)
+        if conflicts or dry_run:
+            return [], conflicts
+        return create_showtimes(proposals), []
+
+
+def local_moment(day, time):
+    return timezone.make_aware(datetime.combine(day, time))
+
+
+def plan_week(week_start, opens, closes, lineup, lock=False):
+    """
+    Showtime proposals filling a week of the lineup's auditoriums
+    Each auditorium plays its movies in turn, every show starting at the
+    first free rounded time after the last one (plus cleaning) ended,
+    from `opens` until the last show that starts by `closes`. A `closes`
+    at or before `opens` is after midnight. Existing showtimes are worked
+    around rather than moved.
+    """
+    days = [week_start + timedelta(days=offset) for offset in range(DAYS_PER_WEEK)]
+    start = local_moment(days[0], opens)
+    # Late shows of the last day may run into the day after next
+    end = start + timedelta(days=DAYS_PER_WEEK + 2)
+    schedule = Schedule.load([entry['auditorium'].pk for entry in lineup], start, end, lock)
+    proposals = []
+    for day in days:
+        day_opens = local_moment(day, opens)
+        day_closes = local_moment(day + timedelta(days=1) if closes <= opens else day, closes)
+        for entry in lineup:
+            auditorium = entry['auditorium']
+            index = schedule.indexes[auditorium.pk]
+            cursor = day_opens
+            turn = 0
+            while True:
+                movie = entry['movies'][turn % len(entry['movies'])]
+                length = timedelta(minutes=movie.duration + auditorium.cleaning_minutes)
+                starts_at = index.next_free(cursor, length)
+                if starts_at > day_closes:
+                    break
+                schedule.add(auditorium.pk, starts_at, movie.duration, ('proposed', len(proposals)))
+                proposals.append({'movie': movie, 'auditorium': auditorium, 'starts_at': starts_at})
+                # Always move on, even for a movie with no running time
+                cursor = max(starts_at + length, starts_at + timedelta(minutes=START_STEP_MINUTES))
+                turn += 1
+    return proposals
+
+
+def generate_week(week_start, opens, closes, lineup, dry_run=False):
+    """
+    Plan and create a week of showtimes in one transaction
+    Returns the created showtimes, or the planned proposals on a dry run.
+    """
+    with transaction.atomic():
+        proposals = plan_week(week_start, opens, closes, lineup, lock=not dry_run)
+        if dry_run or not proposals:
+            return proposals
+        return create_showtimes(proposals)
@@ -0,0 +1,187 @@
+"""
+Movie search.
+
+Every word of the query must match the start of a word in a movie's
+title or description ("ali", "alie" and "alien" all find Alien), so the
+endpoint works for typeahead. Title matches rank above description ones.
+
+On PostgreSQL this is full-text search over an expression GIN index
+(migration 0016) using the english configuration, so words are stemmed
+too. Other databases get an InvertedIndex built in process memory from the
+catalog and rebuilt when CATALOG_SCOPE's version changes; it does not stem.
+"""
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .cache import CATALOG_SCOPE, get_versions
+from .models import Movie, SeatState
+
+SEARCH_CONFIG = 'english'
+# Minutes; (shortest, longest) with None for no bound
+DURATION_BUCKETS = {'short': (None, 90), 'medium': (90, 150), 'long': (150, None)}
+# Title and description weights, as PostgreSQL's A and B weights rank them
+TITLE_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+MAX_TERMS = 8
+# Seconds to cache results that depend on seats still being on sale
+AVAILABILITY_TIMEOUT = 30
+
+_lock = threading.Lock()
+_index = None
+
+
+def search_terms(text):
+    """
+    Lowercase words of a query, which also makes them safe in a tsquery
+    """
+    return re.findall(r'\w+', text.lower())[:MAX_TERMS]
+
+
+def search_vector():
+    # Must match the expression indexed by migration 0016
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+class InvertedIndex:
+    """Movie ids and weights by word, with the words sorted for prefix lookups"""
+
+    def __init__(self, version, movies):
+        self.version = version
+        postings = defaultdict(dict)
+        for movie_id, title, description in movies:
+            for words, weight in ((search_terms(description), DESCRIPTION_WEIGHT), (search_terms(title), TITLE_WEIGHT)):
+                for word in words:
+                    postings[word][movie_id] = max(postings[word].get(movie_id, 0), weight)
+        self.postings = dict(postings)
+        self.words = sorted(self.postings)
+
+    @classmethod
+    def build(cls, version):
+        return cls(version, Movie.objects.values_list('id', 'title', 'description').iterator())
+
+    def prefixed(self, prefix):
+        """
+        Best weight per movie over every word starting with `prefix`
+        """
+        scores = {}
+        position = bisect_left(self.words, prefix)
+        while position < len(self.words) and self.words[position].startswith(prefix):
+            for movie_id, weight in self.postings[self.words[position]].items():
+                scores[movie_id] = max(scores.get(movie_id, 0), weight)
+            position += 1
+        return scores
+
+    def rank(self, terms):
+        """
+        Ids of movies matching every term, best first
+        """
+        scores = None
+        for term in terms:
+            matches = self.prefixed(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {movie_id: scores[movie_id] + weight for movie_id, weight in matches.items() if movie_id in scores}
+            if not scores:
+                return []
+        return sorted(scores, key=lambda movie_id: (-scores[movie_id], movie_id))
+
+
+def catalog_index():
+    """
+    The inverted index of the current catalog, rebuilt when it changes
+    """
+    global _index
+    version = get_versions([CATALOG_SCOPE])[0]
+    with _lock:
+        index = _index
+    if index is None or index.version != version:
+        index = InvertedIndex.build(version)
+        with _lock:
+            _index = index
+    return index
+
+
+def clear():
+    global _index
+    with _lock:
+        _index = None
+
+
+def available_movies(now=None):
+    """
+    Subquery: the movie has a showtime yet to start with a seat on sale
+    """
+    now = now or timezone.now()
+    return Exists(
+        SeatState.objects.available(now).filter(showtime__movie=OuterRef('pk'), showtime__starts_at__gt=now)
+    )
+
+
+def filter_movies(queryset, released_from=None, released_to=None, duration=None, available=False):
+    if released_from:
+        queryset = queryset.filter(release_date__gte=released_from)
+    if released_to:
+        queryset = queryset.filter(release_date__lte=released_to)
+    if duration:
+        shortest, longest = DURATION_BUCKETS[duration]
+        if shortest is not None:
+            queryset = queryset.filter(duration__gte=shortest)
+        if longest is not None:
+            queryset = queryset.filter(duration__lt=longest)
+    if available:
+        queryset = queryset.filter(available_movies())
+    return queryset
+
+
+def search_movies(queryset, text):
+    """
+    Movies of `queryset` matching `text`, best first
+    A queryset on PostgreSQL; a list elsewhere. Without search words every
+    movie matches, by title.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset.order_by('title', 'id')
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+        return queryset.annotate(search=search_vector()).filter(search=query).annotate(
+            rank=SearchRank(search_vector(), query)
+        ).order_by('-rank', 'id')
+    ranked = catalog_index().rank(terms)
+    movies = queryset.in_bulk(ranked)
+    return [movies[movie_id] for movie_id in ranked if movie_id in movies]
+
+
+def facet_counts(movies):
+    """
+    How many of the matched movies fall in each duration bucket, and how
+    many have seats on sale
+    """
+    if isinstance(movies, list):
+        movies = Movie.objects.filter(pk__in=[movie.pk for movie in movies])
+    counts = {}
+    for name, (shortest, longest) in DURATION_BUCKETS.items():
+        bucket = Q()
+        if shortest is not None:
+            bucket &= Q(duration__gte=shortest)
+        if longest is not None:
+            bucket &= Q(duration__lt=longest)
+        counts[name] = Count('pk', filter=bucket)
+    totals = movies.order_by().annotate(has_seats=available_movies()).aggregate(
+        available=Count('pk', filter=Q(has_seats=True)), **counts
+    )
+    return {
+        'duration': {name: totals[name] for name in DURATION_BUCKETS},
+        'available': totals['available'],
+    }
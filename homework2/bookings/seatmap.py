@@ -0,0 +1,58 @@
+"""
+Compact seat map encoding.
+
+A showtime's layout is its seats ordered by id. Availability is sent as a
+bitset over that order: bit i (most significant bit first) is set when the
+i-th seat of the layout can still be booked.
+"""
+import base64
+import hashlib
+
+from django.utils import timezone
+
+from .models import SeatState
+
+
+def encode_bitmap(flags):
+    """
+    Pack a sequence of booleans into bytes
+    """
+    data = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            data[index >> 3] |= 0x80 >> (index & 7)
+    return bytes(data)
+
+
+def decode_bitmap(data, count):
+    """
+    Unpack the first `count` booleans from a bitset
+    """
+    return [bool(data[index >> 3] & (0x80 >> (index & 7))) for index in range(count)]
+
+
+def showtime_layout(showtime):
+    """
+    (seat id, seat number) pairs in bitset order, plus an ETag for them
+    """
+    seats = list(
+        SeatState.objects.filter(showtime=showtime)
+        .order_by('seat_id')
+        .values_list('seat_id', 'seat__seat_number')
+    )
+    etag = '"%s"' % hashlib.md5(repr(seats).encode()).hexdigest()
+    return seats, etag
+
+
+def showtime_availability(showtime, now=None):
+    """
+    Availability bitset of a showtime, base64 encoded
+    """
+    now = now or timezone.now()
+    flags = [
+        not booked and (held_until is None or held_until <= now)
+        for booked, held_until in SeatState.objects.filter(showtime=showtime)
+        .order_by('seat_id')
+        .values_list('booking_status', 'held_until')
+    ]
+    return len(flags), base64.b64encode(encode_bitmap(flags)).decode('ascii')
@@ -1,17 +1,105 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Movie, Seat, Booking
+from .metrics import time_serialization
+from .scheduling import MAX_PROPOSALS, showtime_conflicts
+from .search import DURATION_BUCKETS
+from .models import Auditorium, Movie, Seat, Showtime, SeatState, SeatHold, Booking, BookingEvent, WaitlistEntry
+
+def parse_field_selection(value):
+    """
+    Turn "id,seat,movie.title" into {'id': {}, 'seat': {}, 'movie': {'title': {}}}
+    """
+    selection = {}
+    for path in value.split(','):
+        node = selection
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return selection
+
+def prune_fields(fields, selection):
+    """
+    Drop every field not named in the selection, recursing into nested serializers
+    """
+    for name in list(fields):
+        if name not in selection:
+            del fields[name]
+        elif selection[name]:
+            nested = getattr(fields[name], 'child', fields[name])
+            if isinstance(nested, serializers.Serializer):
+                prune_fields(nested.fields, selection[name])
+    return fields
+
+class SparseFieldsMixin:
+    """
+    Let clients ask for a subset of fields with ?fields=id,seat,movie.title
+    Only applies to the top-level serializer of a response.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        request = self.context.get('request')
+        if parent is not None or request is None:
+            return fields
+        selection = parse_field_selection(request.query_params.get('fields', ''))
+        if not selection:
+            return fields
+        return prune_fields(fields, selection)
+
+    def to_representation(self, instance):
+        return time_serialization(super().to_representation, instance)
 
 # Serializers define the API representation.
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Movie
         fields = ['id', 'title', 'description', 'release_date', 'duration']
 
-class SeatSerializer(serializers.ModelSerializer):
+class SeatSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Seat
-        fields = ['id', 'seat_number', 'booking_status']
+        fields = [
+            'id', 'seat_number', 'booking_status',
+            'auditorium', 'row', 'number', 'column', 'is_accessible', 'is_premium',
+        ]
+
+class ShowtimeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Showtime
+        fields = ['id', 'movie', 'auditorium', 'starts_at', 'admission_rate']
+
+    def validate(self, data):
+        """Reject a showtime that overlaps another in its auditorium"""
+        movie = data.get('movie', getattr(self.instance, 'movie', None))
+        auditorium = data.get('auditorium', getattr(self.instance, 'auditorium', None))
+        starts_at = data.get('starts_at', getattr(self.instance, 'starts_at', None))
+        if movie is not None and auditorium is not None and starts_at is not None:
+            conflicts = showtime_conflicts(movie, auditorium, starts_at, exclude=getattr(self.instance, 'pk', None))
+            if conflicts:
+                raise serializers.ValidationError(
+                    {'starts_at': f"Overlaps showtime {conflicts[0]} in this auditorium"}
+                )
+        return data
+
+class SeatStateSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Seat as seen by a single showtime, shaped like SeatSerializer"""
+    id = serializers.IntegerField(source='seat_id', read_only=True)
+    seat_number = serializers.CharField(source='seat.seat_number', read_only=True)
+    auditorium = serializers.IntegerField(source='seat.auditorium_id', read_only=True)
+    row = serializers.CharField(source='seat.row', read_only=True)
+    number = serializers.IntegerField(source='seat.number', read_only=True)
+    column = serializers.IntegerField(source='seat.column', read_only=True)
+    is_accessible = serializers.BooleanField(source='seat.is_accessible', read_only=True)
+    is_premium = serializers.BooleanField(source='seat.is_premium', read_only=True)
+
+    class Meta:
+        model = SeatState
+        fields = [
+            'id', 'seat_number', 'booking_status',
+            'auditorium', 'row', 'number', 'column', 'is_accessible', 'is_premium',
+        ]
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,23 +107,229 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email']
         read_only_fields = ['id', 'username']
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     movie = MovieSerializer(read_only=True)
     seat = SeatSerializer(read_only=True)
     
     class Meta:
         model = Booking
-        fields = ['id', 'movie', 'seat', 'user', 'booking_date']
-        read_only_fields = ['booking_date']
+        fields = ['id', 'movie', 'showtime', 'seat', 'user', 'booking_date', 'price']
+        read_only_fields = ['showtime', 'booking_date', 'price']
 
 class BookingCreateSerializer(serializers.Serializer):
-    """Serializer for creating a new booking"""
-    movie = serializers.PrimaryKeyRelatedField(queryset=Movie.objects.all())
+    """Serializer for creating a new booking
+
+    Seat availability is not checked here: the view claims the seat
+    atomically so two concurrent requests cannot both pass validation.
+    """
+    showtime = serializers.PrimaryKeyRelatedField(queryset=Showtime.objects.select_related('movie'))
     seat = serializers.PrimaryKeyRelatedField(queryset=Seat.objects.all())
 
-    def validate_seat(self, value):
-        """Ensure seat is available"""
-        if value.booking_status:
-            raise serializers.ValidationError("This seat is already booked")
-        return value
\ No newline at end of file
+class BookingTransferSerializer(serializers.Serializer):
+    """The user a booking is given to, by username"""
+    user = serializers.SlugRelatedField(slug_field='username', queryset=User.objects.all())
+
+    def validate_user(self, value):
+        if value.pk == self.context['booking'].user_id:
+            raise serializers.ValidationError("The booking already belongs to this user")
+        return value
+
+class BookingEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BookingEvent
+        fields = [
+            'id', 'kind', 'booking_id', 'user_id', 'from_user_id', 'movie_id', 'showtime_id', 'seat_id',
+            'price', 'created_at',
+        ]
+
+class EventLogFilterSerializer(serializers.Serializer):
+    """Query parameters of the booking event log"""
+    # A cursor returned by an earlier read
+    after = serializers.RegexField(r'^\d+-\d+$', default='0-0')
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=500)
+
+class SeatHoldSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    seats = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SeatHold
+        fields = ['id', 'showtime', 'seats', 'created_at', 'expires_at']
+
+    def get_seats(self, hold):
+        return sorted(state.seat_id for state in hold.seat_states.all())
+
+class SeatHoldCreateSerializer(serializers.Serializer):
+    """Serializer for holding one or more seats of a showtime"""
+    showtime = serializers.PrimaryKeyRelatedField(queryset=Showtime.objects.all())
+    seats = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1)
+
+    def validate_seats(self, value):
+        """Ensure no seat is listed twice"""
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Each seat can only be listed once")
+        return value
+
+class BulkBookingCreateSerializer(SeatHoldCreateSerializer):
+    """Serializer for booking several seats of a showtime at once"""
+
+class BestAvailableSerializer(serializers.Serializer):
+    """Party size and seating preferences for a best-available request"""
+    party_size = serializers.IntegerField(min_value=1, max_value=10)
+    center = serializers.BooleanField(default=True)
+    row_from = serializers.CharField(max_length=5, required=False)
+    row_to = serializers.CharField(max_length=5, required=False)
+    accessible = serializers.BooleanField(default=False)
+    book = serializers.BooleanField(default=False)
+
+class WaitlistEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    position = serializers.SerializerMethodField()
+    offer_expires_at = serializers.SerializerMethodField()
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'showtime', 'status', 'position', 'hold', 'offer_expires_at', 'created_at']
+
+    def get_position(self, entry):
+        """1 for the next user to be offered a seat; None unless waiting"""
+        if entry.status != WaitlistEntry.WAITING:
+            return None
+        return entry.ahead + 1
+
+    def get_offer_expires_at(self, entry):
+        if entry.status != WaitlistEntry.OFFERED or entry.hold is None:
+            return None
+        return serializers.DateTimeField().to_representation(entry.hold.expires_at)
+
+class WaitlistJoinSerializer(serializers.Serializer):
+    """Serializer for joining a showtime's waitlist"""
+    showtime = serializers.PrimaryKeyRelatedField(queryset=Showtime.objects.all())
+
+def lookup_ids(items, field, model):
+    """
+    Replace the `field` ids of validated items with objects, one query for all
+    """
+    objects = model.objects.in_bulk({item[field] for item in items})
+    missing = sorted({item[field] for item in items} - set(objects))
+    if missing:
+        raise serializers.ValidationError(f"No {field} with id {', '.join(map(str, missing))}")
+    for item in items:
+        item[field] = objects[item[field]]
+    return items
+
+class ScheduledShowtimeSerializer(serializers.Serializer):
+    """One proposed showtime; ids are looked up for the whole batch"""
+    movie = serializers.IntegerField(min_value=1)
+    auditorium = serializers.IntegerField(min_value=1)
+    starts_at = serializers.DateTimeField()
+
+class ShowtimeScheduleSerializer(serializers.Serializer):
+    """Showtimes to check and create together"""
+    showtimes = ScheduledShowtimeSerializer(many=True, allow_empty=False, max_length=MAX_PROPOSALS)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate_showtimes(self, showtimes):
+        return lookup_ids(lookup_ids(showtimes, 'movie', Movie), 'auditorium', Auditorium)
+
+class LineupSerializer(serializers.Serializer):
+    """Movies an auditorium plays in turn"""
+    auditorium = serializers.IntegerField(min_value=1)
+    movies = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1)
+
+class WeekScheduleSerializer(serializers.Serializer):
+    """A week of showtimes to generate"""
+    week_start = serializers.DateField()
+    opens = serializers.TimeField()
+    closes = serializers.TimeField()
+    lineup = LineupSerializer(many=True, allow_empty=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate_lineup(self, lineup):
+        auditorium_ids = [entry['auditorium'] for entry in lineup]
+        if len(set(auditorium_ids)) != len(auditorium_ids):
+            raise serializers.ValidationError("Each auditorium can only be listed once")
+        movies = Movie.objects.in_bulk({movie_id for entry in lineup for movie_id in entry['movies']})
+        missing = sorted({movie_id for entry in lineup for movie_id in entry['movies']} - set(movies))
+        if missing:
+            raise serializers.ValidationError(f"No movie with id {', '.join(map(str, missing))}")
+        for entry in lineup:
+            entry['movies'] = [movies[movie_id] for movie_id in entry['movies']]
+        return lookup_ids(lineup, 'auditorium', Auditorium)
+
+class BookingExportFilterSerializer(serializers.Serializer):
+    """Query parameters of the booking export"""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    movie = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, data):
+        if 'start' in data and 'end' in data and data['start'] > data['end']:
+            raise serializers.ValidationError("start must not be after end")
+        return data
+
+class SalesReportFilterSerializer(BookingExportFilterSerializer):
+    """Query parameters of the sales report"""
+    group = serializers.ChoiceField(choices=['day', 'movie', 'showtime'], default='day')
+
+class MovieSearchSerializer(serializers.Serializer):
+    """Query parameters of the movie search"""
+    q = serializers.CharField(required=False, allow_blank=True, max_length=200, default='')
+    released_from = serializers.DateField(required=False)
+    released_to = serializers.DateField(required=False)
+    duration = serializers.ChoiceField(choices=list(DURATION_BUCKETS), required=False)
+    available = serializers.BooleanField(required=False, default=False)
+    facets = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if 'released_from' in data and 'released_to' in data and data['released_from'] > data['released_to']:
+            raise serializers.ValidationError("released_from must not be after released_to")
+        return data
+
+class AuditoriumSerializer(serializers.ModelSerializer):
+    seat_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Auditorium
+        fields = ['id', 'name', 'cleaning_minutes', 'seat_count']
+
+class SeatSelectionField(serializers.Field):
+    """A list of seat numbers, or true for every seat in the row"""
+    default_error_messages = {
+        'invalid': 'Expected a list of seat numbers or true.',
+    }
+
+    def to_internal_value(self, data):
+        if data is True:
+            return True
+        if not isinstance(data, list) or not all(isinstance(number, int) for number in data):
+            self.fail('invalid')
+        return data
+
+    def to_representation(self, value):
+        return value
+
+class LayoutRowSerializer(serializers.Serializer):
+    """One row of an auditorium layout"""
+    row = serializers.CharField(max_length=5)
+    seats = serializers.IntegerField(min_value=1, max_value=999)
+    aisles = serializers.ListField(child=serializers.IntegerField(), required=False)
+    accessible = SeatSelectionField(required=False)
+    premium = SeatSelectionField(required=False)
+
+    def validate(self, data):
+        for key in ('aisles', 'accessible', 'premium'):
+            numbers = data.get(key)
+            if isinstance(numbers, list) and any(not 1 <= number <= data['seats'] for number in numbers):
+                raise serializers.ValidationError({key: f"Seat numbers must be between 1 and {data['seats']}"})
+        return data
+
+class SeatLayoutSerializer(serializers.Serializer):
+    """An auditorium layout to import"""
+    auditorium = serializers.CharField(max_length=100)
+    rows = LayoutRowSerializer(many=True, allow_empty=False)
+
+    def validate_rows(self, rows):
+        labels = [row['row'] for row in rows]
+        if len(set(labels)) != len(labels):
+            raise serializers.ValidationError("Each row can only be listed once")
+        return rows
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import (
+    CATALOG_SCOPE, SEATS_SCOPE, admission_scope, bump_on_commit, movie_scope, pricing_scope, showtime_scope,
+)
+from .models import Movie, Seat, SeatState, Showtime
+
+
+@receiver(post_save, sender=Showtime)
+def create_showtime_seat_states(sender, instance, created, raw=False, **kwargs):
+    """Give a new showtime its own copy of its auditorium's seat map"""
+    if created and not raw:
+        SeatState.objects.create_for([instance], Seat.objects.filter(auditorium_id=instance.auditorium_id))
+
+
+@receiver(post_save, sender=Seat)
+def create_seat_states_for_upcoming_showtimes(sender, instance, created, raw=False, **kwargs):
+    """Make a newly added seat bookable for showtimes that have not started"""
+    if created and not raw:
+        showtimes = Showtime.objects.filter(starts_at__gte=timezone.now(), auditorium_id=instance.auditorium_id)
+        SeatState.objects.create_for(showtimes, [instance])
+
+
+@receiver([post_save, post_delete], sender=Movie)
+def invalidate_movie(sender, instance, **kwargs):
+    bump_on_commit(CATALOG_SCOPE, movie_scope(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Showtime)
+def invalidate_showtime(sender, instance, **kwargs):
+    bump_on_commit(showtime_scope(instance.pk), admission_scope(instance.pk), pricing_scope(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Seat)
+def invalidate_seats(sender, instance, **kwargs):
+    # Seat numbers appear in every showtime's availability lists
+    bump_on_commit(SEATS_SCOPE)
@@ -0,0 +1,198 @@
+"""
+Token-bucket rate limiting per route group.
+
+Requests are sorted into groups: every read is in "reads", and views name
+the groups of their write actions in `throttle_groups` ("booking_writes"
+for claiming seats, "cancels" for giving them back). Each group's rate in
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] ("300/min") is a bucket of that
+many tokens refilled evenly over the period, so clients can burst up to
+the rate and then settle to its average. Buckets are kept per user, or
+per client IP for anonymous requests; a group without a rate is not
+limited.
+
+A bucket is a (tokens, updated) pair, so a check is one read and one write
+of the store named by THROTTLE_BUCKET_STORE: process memory by default
+(each worker limits on its own) or the bookings cache, shared by every
+worker using it. Neither touches the database.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .cache import get_cache
+
+READS = 'reads'
+BOOKING_WRITES = 'booking_writes'
+CANCELS = 'cancels'
+MAX_BUCKETS = 100000
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    "300/min" -> (300, 5.0): bucket size and tokens refilled per second
+    """
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def take_token(bucket, capacity, refill, now):
+    """
+    Refill a bucket up to `now` and take a token from it
+    Returns the new bucket and how many seconds to wait (0 if allowed).
+    """
+    tokens, updated = bucket if bucket is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) / refill
+
+
+class LocalBucketStore:
+    """Buckets in process memory; each worker process limits on its own"""
+
+    def __init__(self, max_buckets=MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, capacity, refill, now):
+        with self._lock:
+            bucket, wait = take_token(self._buckets.get(key), capacity, refill, now)
+            self._buckets[key] = bucket
+            self._buckets.move_to_end(key)
+            # Evicting the least recently used bucket only forgets a client
+            # that has been quiet, whose bucket has refilled anyway
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def atake(self, key, capacity, refill, now):
+        return self.take(key, capacity, refill, now)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets in the bookings cache, shared by every process using it
+    Reading and writing a bucket are two cache calls, so requests racing
+    on one bucket can both take its last token.
+    """
+
+    def key(self, key):
+        return f'bookings:throttle:{key}'
+
+    def timeout(self, capacity, refill):
+        # An untouched bucket is full again after this, same as a missing one
+        return math.ceil(capacity / refill) + 1
+
+    def take(self, key, capacity, refill, now):
+        cache = get_cache()
+        bucket, wait = take_token(cache.get(self.key(key)), capacity, refill, now)
+        cache.set(self.key(key), bucket, self.timeout(capacity, refill))
+        return wait
+
+    async def atake(self, key, capacity, refill, now):
+        cache = get_cache()
+        bucket, wait = take_token(await cache.aget(self.key(key)), capacity, refill, now)
+        await cache.aset(self.key(key), bucket, self.timeout(capacity, refill))
+        return wait
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    path = settings.THROTTLE_BUCKET_STORE
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = import_string(path)()
+        return _stores[path]
+
+
+def group_rate(group):
+    """
+    (capacity, refill per second) of a route group, or None if unlimited
+    """
+    rate = api_settings.DEFAULT_THROTTLE_RATES.get(group) if group else None
+    return parse_rate(rate) if rate else None
+
+
+def route_group(request, view):
+    """
+    The route group a DRF request counts against, or None
+    """
+    group = getattr(view, 'throttle_groups', {}).get(getattr(view, 'action', None))
+    if group is None and request.method in SAFE_METHODS:
+        group = READS
+    return group
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Limit each user (or anonymous IP) per route group
+    DRF sends Retry-After with the 429 from wait().
+    """
+    timer = time.time
+
+    def bucket_key(self, request, group, user):
+        if user is not None and user.is_authenticated:
+            return f'{group}:user:{user.pk}'
+        return f'{group}:ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0.0
+        group = route_group(request, view)
+        rate = group_rate(group)
+        if rate is None:
+            return True
+        key = self.bucket_key(request, group, request.user)
+        self.wait_seconds = get_store().take(key, *rate, self.timer())
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def throttled_response(wait):
+    response = JsonResponse(
+        {'detail': f'Request was throttled. Expected available in {wait} seconds.'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response['Retry-After'] = str(wait)
+    return response
+
+
+def throttle_async(group):
+    """
+    Apply a route group's limit to an async (non-DRF) view
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            rate = group_rate(group)
+            if rate is not None:
+                throttle = TokenBucketThrottle()
+                key = throttle.bucket_key(request, group, await request.auser())
+                wait = await get_store().atake(key, *rate, throttle.timer())
+                if wait:
+                    return throttled_response(math.ceil(wait))
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
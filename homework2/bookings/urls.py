@@ -8,11 +8,28 @@ from . import views
 router = routers.DefaultRouter()
 router.register(r'movies', views.MovieViewSet)
 router.register(r'seats', views.SeatViewSet)
+router.register(r'auditoriums', views.AuditoriumViewSet)
+router.register(r'showtimes', views.ShowtimeViewSet)
 router.register(r'bookings', views.BookingViewSet)
+router.register(r'holds', views.SeatHoldViewSet)
+router.register(r'waitlist', views.WaitlistViewSet)
 
 # Wire up our API using automatic URL routing.
 # Additionally, we include login URLs for the browsable API.
 urlpatterns = [
+    # Ahead of the router, whose waitlist/{id}/ route would match "stream"
+    path('api/waitlist/stream/', views.waitlist_stream, name='waitlist_stream'),
     path('api/', include(router.urls)),
+    path('api/showtimes/<int:pk>/stream/', views.seat_stream, name='seat_stream'),
+    path('api/showtimes/<int:pk>/admission/', views.admission_queue, name='admission_queue'),
+    path('api/async/movies/', views.async_movie_list, name='async_movie_list'),
+    path('api/async/movies/<int:pk>/', views.async_movie_detail, name='async_movie_detail'),
+    path('api/async/seats/available/', views.async_available_seats, name='async_available_seats'),
+    path('api/async/bookings/', views.async_booking_history, name='async_booking_history'),
+    path('api/reports/sales/', views.sales_report, name='sales_report'),
+    path('api/events/', views.booking_events, name='booking_events'),
+    path('api/cache/stats/', views.cache_stats, name='cache_stats'),
+    path('api/metrics/slow-queries/', views.slow_queries, name='slow_queries'),
+    path('metrics', views.metrics_endpoint, name='metrics'),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
 ]
\ No newline at end of file
@@ -1,35 +1,559 @@
-from django.shortcuts import render
-from django.http import HttpResponse
-from django.db import transaction
-from .models import Movie, Seat, Booking
+from datetime import timedelta
+from django.conf import settings
+from django.shortcuts import render, get_object_or_404
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+from .models import Auditorium, Movie, Seat, Showtime, SeatState, SeatHold, Booking, BookingEvent, WaitlistEntry
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from .serializers import MovieSerializer, SeatSerializer, BookingSerializer, BookingCreateSerializer
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from . import admission, best_available, cache, events, metrics, pricing, rollups
+from .cache import (
+    CATALOG_SCOPE, SEATS_SCOPE, availability_timeout, bump_on_commit, movie_scope, read_through, showtime_scope,
+)
+from .export import CSVRenderer, NDJSONRenderer, export_response
+from .idempotency import idempotent
+from .layouts import CSVTextParser, import_layout, parse_csv_layout
+from .conditional import list_etag, newest, not_modified, object_validators, seat_map_etag, set_validators
+from .realtime import seat_events, seat_map_changed
+from .scheduling import generate_week, schedule_showtimes
+from .search import AVAILABILITY_TIMEOUT, facet_counts, filter_movies, search_movies
+from .seatmap import showtime_availability, showtime_layout
+from .pagination import BookingCursorPagination, MovieSearchPagination, SeatCursorPagination
+from .throttling import BOOKING_WRITES, CANCELS, READS, throttle_async
+from .waitlist import close_offer, reserve_for_waitlist, waitlist_events
+from .serializers import (
+    MovieSerializer, SeatSerializer, ShowtimeSerializer, SeatStateSerializer, BestAvailableSerializer,
+    BookingSerializer, BookingCreateSerializer, BulkBookingCreateSerializer, BookingExportFilterSerializer,
+    SeatHoldSerializer, SeatHoldCreateSerializer, AuditoriumSerializer, SeatLayoutSerializer,
+    WaitlistEntrySerializer, WaitlistJoinSerializer, ShowtimeScheduleSerializer, WeekScheduleSerializer,
+    SalesReportFilterSerializer, MovieSearchSerializer, BookingTransferSerializer, BookingEventSerializer,
+    EventLogFilterSerializer,
+)
 
 # Create your views here.
 def index(request):
     return HttpResponse("Hello world. You're at the bookings index.")
 
-class MovieViewSet(viewsets.ModelViewSet):
+def get_showtime_id(request):
+    """
+    Read the optional ?showtime= query parameter
+    """
+    showtime_id = request.query_params.get('showtime')
+    if showtime_id is None:
+        return None
+    if not showtime_id.isdigit():
+        raise ValidationError({'showtime': 'A valid showtime id is required'})
+    return int(showtime_id)
+
+class PaginatedActionMixin:
+    """
+    Paginate custom list actions the same way list() does
+    """
+    def list_response(self, queryset, serializer_class=None):
+        serializer_class = serializer_class or self.get_serializer_class()
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = serializer_class(page, many=True, context=context)
+            return self.get_paginated_response(serializer.data)
+        serializer = serializer_class(queryset, many=True, context=context)
+        return Response(serializer.data)
+
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match/If-Modified-Since with a 304 before serializing
+
+    validator_fields are the updated_at/version columns that change
+    whenever a row's representation changes; nested_models are the models
+    nested in each listed row, whose changes change a list too.
+    """
+    validator_fields = ('updated_at',)
+    nested_models = ()
+
+    def queryset_etag(self, queryset):
+        nested = {model._meta.model_name: newest(model.objects.all()) for model in self.nested_models}
+        return list_etag(self.request, queryset, **nested)
+
+    def conditional_list(self, respond, etag=None):
+        etag = etag or self.queryset_etag(self.filter_queryset(self.get_queryset()))
+        response = not_modified(self.request, etag, None) or respond()
+        return set_validators(response, etag, None)
+
+    def conditional_entry(self, entry):
+        """
+        Respond from a cached entry that carries its own validators
+        """
+        etag, modified = entry['etag'], entry['last_modified']
+        response = not_modified(self.request, etag, modified) or Response(entry['data'])
+        return set_validators(response, etag, modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_list(lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, modified = object_validators(request, instance, self.validator_fields)
+        response = not_modified(request, etag, modified) or Response(self.get_serializer(instance).data)
+        return set_validators(response, etag, modified)
+
+def cache_vary(request):
+    """
+    Cache entries differ per URL (absolute, for pagination links) and format
+    """
+    return f'{request.accepted_renderer.format}:{request.build_absolute_uri()}'
+
+def create_bookings(user, showtime, seat_ids):
+    """
+    Insert one booking per seat with a single bulk INSERT
+    Must run inside the transaction that claimed the seats, which then
+    records their events last. Seats are sold at the showtime's current
+    price table.
+    """
+    prices = pricing.seat_prices(showtime.pk, seat_ids)
+    bookings = Booking.objects.bulk_create([
+        Booking(
+            user=user,
+            movie_id=showtime.movie_id,
+            showtime=showtime,
+            seat_id=seat_id,
+            booking_date=timezone.localdate(),
+            price=prices[seat_id]
+        )
+        for seat_id in seat_ids
+    ])
+    rollups.record_bookings(bookings)
+    return bookings
+
+def release_seat(booking):
+    """
+    Put a deleted booking's seat back on sale
+    Must run inside the transaction that deleted the booking. A sold-out
+    showtime's waitlist gets first refusal of the seat.
+    """
+    if booking.showtime_id is not None:
+        SeatState.objects.filter(
+            showtime_id=booking.showtime_id, seat_id=booking.seat_id
+        ).update(booking_status=False, hold=None, held_until=None)
+        if not reserve_for_waitlist(booking.showtime_id, [booking.seat_id]):
+            seat_map_changed(booking.showtime_id, available=[booking.seat_id])
+    else:
+        Seat.objects.filter(pk=booking.seat_id).update(
+            booking_status=False, updated_at=timezone.now()
+        )
+        bump_on_commit(SEATS_SCOPE)
+
+def cancel_booking(booking):
+    """
+    Delete a booking, take it off the rollups, free its seat and log it
+    Returns False, changing nothing, if the booking was cancelled or given
+    to someone else since it was read.
+    """
+    with transaction.atomic():
+        # A conditional UPDATE on the owner we checked locks the row, so of
+        # concurrent cancels (or a cancel racing a transfer) only one wins
+        locked = Booking.objects.filter(pk=booking.pk, user_id=booking.user_id).update(
+            updated_at=timezone.now()
+        )
+        if not locked:
+            return False
+        cancelled = events.pending(BookingEvent.CANCELLED, [booking])
+        booking.delete()
+        rollups.record_bookings([booking], sign=-1)
+        release_seat(booking)
+        events.append(cancelled)
+    return True
+
+def hold_seats(user, showtime, seat_ids, now=None):
+    """
+    Hold seats for SEAT_HOLD_TTL_SECONDS, all or nothing
+    Returns the hold, or None if any seat was booked or held already.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        hold = SeatHold.objects.create(
+            user=user,
+            showtime=showtime,
+            expires_at=now + timedelta(seconds=settings.SEAT_HOLD_TTL_SECONDS)
+        )
+        # One UPDATE for the whole group; it only counts seats that
+        # were still free, so a short count means someone beat us
+        claimed = SeatState.objects.filter(
+            showtime=showtime, seat_id__in=seat_ids
+        ).available(now).update(hold=hold, held_until=hold.expires_at)
+        if claimed != len(seat_ids):
+            transaction.set_rollback(True)
+            return None
+        seat_map_changed(showtime.pk, unavailable=seat_ids)
+    return hold
+
+def book_seats(user, showtime, seat_ids):
+    """
+    Book seats, all or nothing
+    Returns the bookings, or None if any seat was booked or held already.
+    """
+    with transaction.atomic():
+        # One conditional UPDATE claims the whole group; a short count
+        # means at least one seat was taken, so undo the lot. Clearing a
+        # lapsed hold keeps the expiry sweep off the booked seats
+        claimed = SeatState.objects.filter(
+            showtime=showtime, seat_id__in=seat_ids
+        ).available().update(booking_status=True, hold=None, held_until=None)
+        if claimed != len(seat_ids):
+            transaction.set_rollback(True)
+            return None
+        bookings = create_bookings(user, showtime, seat_ids)
+        seat_map_changed(showtime.pk, unavailable=seat_ids)
+        events.record(BookingEvent.CREATED, bookings)
+    return bookings
+
+def release_hold(hold):
+    """
+    Put a hold's seats back on sale, or to the showtime's waitlist first
+    Releasing a waitlist offer declines it.
+    """
+    with transaction.atomic():
+        seat_ids = list(hold.seat_states.values_list('seat_id', flat=True))
+        SeatState.objects.filter(hold=hold).update(hold=None, held_until=None)
+        close_offer(hold, WaitlistEntry.DECLINED)
+        hold.delete()
+        if not reserve_for_waitlist(hold.showtime_id, seat_ids):
+            seat_map_changed(hold.showtime_id, available=seat_ids)
+
+def serialize_bookings(bookings):
+    """
+    Serialize freshly created bookings with one joined query
+    """
+    bookings = Booking.objects.filter(
+        pk__in=[booking.pk for booking in bookings]
+    ).select_related('user', 'movie', 'seat')
+    return BookingSerializer(bookings, many=True).data
+
+async def seat_stream(request, pk):
+    """
+    Stream seat availability changes for a showtime as server-sent events
+    GET /api/showtimes/{id}/stream/
+    Sends a "snapshot" event (same shape as /availability/) followed by
+    "delta" events listing seats that became available or unavailable.
+    """
+    if not await Showtime.objects.filter(pk=pk).aexists():
+        raise Http404("No showtime matches the given query.")
+    response = StreamingHttpResponse(seat_events(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def waitlist_stream(request):
+    """
+    Stream the current user's waitlist offers as server-sent events
+    GET /api/waitlist/stream/
+    Sends a "snapshot" event listing active entries, then an "offer"
+    event whenever a seat is offered.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_403_FORBIDDEN
+        )
+    response = StreamingHttpResponse(waitlist_events(user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# Async read endpoints for the ASGI deployment. DRF views are sync, so
+# under uvicorn each request to them hops through a thread; these plain
+# Django views use the async ORM and return the same shapes.
+
+def async_not_found(model):
+    return JsonResponse(
+        {'detail': f'No {model._meta.object_name} matches the given query.'}, status=status.HTTP_404_NOT_FOUND
+    )
+
+def async_page_size(request, paginator_class):
+    page_size = request.GET.get('page_size', '')
+    if not page_size.isdigit() or int(page_size) < 1:
+        return paginator_class.page_size
+    return min(int(page_size), paginator_class.max_page_size)
+
+@require_GET
+@throttle_async(READS)
+async def async_movie_list(request):
+    """
+    List all movies
+    GET /api/async/movies/
+    """
+    movies = [movie async for movie in Movie.objects.order_by('id').aiterator()]
+    return JsonResponse(MovieSerializer(movies, many=True).data, safe=False)
+
+@require_GET
+@throttle_async(READS)
+async def async_movie_detail(request, pk):
+    """
+    Retrieve a specific movie
+    GET /api/async/movies/{id}/
+    """
+    try:
+        movie = await Movie.objects.aget(pk=pk)
+    except Movie.DoesNotExist:
+        return async_not_found(Movie)
+    return JsonResponse(MovieSerializer(movie).data)
+
+@require_GET
+@throttle_async(READS)
+async def async_available_seats(request):
+    """
+    Seats still free for a showtime (or, without ?showtime=, legacy free seats)
+    GET /api/async/seats/available/?showtime=1
+    Returns {"count": n, "results": [...]} with every free seat.
+    """
+    showtime_id = request.GET.get('showtime')
+    if showtime_id is None:
+        seats = Seat.objects.filter(booking_status=False).order_by('id')
+        serializer_class = SeatSerializer
+    elif not showtime_id.isdigit():
+        return JsonResponse(
+            {'showtime': ['A valid showtime id is required']}, status=status.HTTP_400_BAD_REQUEST
+        )
+    else:
+        seats = SeatState.objects.filter(
+            showtime_id=showtime_id
+        ).available().select_related('seat').order_by('seat_id')
+        serializer_class = SeatStateSerializer
+
+    # Every ORM call is a hop to the request's sync thread, so only look
+    # the showtime up when there is nothing to show
+    results = [seat async for seat in seats.aiterator()]
+    if not results and showtime_id and not await Showtime.objects.filter(pk=showtime_id).aexists():
+        return async_not_found(Showtime)
+    return JsonResponse({'count': len(results), 'results': serializer_class(results, many=True).data})
+
+@require_GET
+@throttle_async(READS)
+async def async_booking_history(request):
+    """
+    Current user's booking history, newest first
+    GET /api/async/bookings/?page_size=50
+    Follow the "next" link (?before=<id>) for older bookings.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_403_FORBIDDEN
+        )
+
+    page_size = async_page_size(request, BookingCursorPagination)
+    bookings = Booking.objects.filter(user=user).select_related('user', 'movie', 'seat').order_by('-id')
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        bookings = bookings.filter(id__lt=before)
+    page = [booking async for booking in bookings[:page_size + 1].aiterator()]
+
+    next_url = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_url = replace_query_param(request.build_absolute_uri(), 'before', page[-1].id)
+    return JsonResponse({'next': next_url, 'results': BookingSerializer(page, many=True).data})
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def admission_queue(request, pk):
+    """
+    Join a showtime's waiting room, or check your place in it
+    POST /api/showtimes/{id}/admission/
+    GET /api/showtimes/{id}/admission/?ticket=<ticket from the POST>
+    Once admitted the response carries a token to send as the
+    X-Admission-Token header of booking writes. Showtimes without a
+    waiting room admit everyone straight away.
+    """
+    if request.method == 'POST':
+        if not Showtime.objects.filter(pk=pk).exists():
+            raise Http404("No showtime matches the given query.")
+        return Response(admission.join_queue(pk, request.user))
+    result = admission.ticket_status(pk, request.query_params.get('ticket', ''), request.user)
+    if result is None:
+        raise ValidationError({'ticket': 'A valid ticket for this showtime is required'})
+    response = Response(result)
+    if result['wait_seconds']:
+        response['Retry-After'] = str(result['wait_seconds'])
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_report(request):
+    """
+    Seats sold, read from the sales rollups
+    GET /api/reports/sales/?group=day&start=2025-01-01&end=2025-01-31&movie=1
+    group is day (per movie and booking date), movie (summed over the
+    range) or showtime (filtered on the day it starts).
+    """
+    filters = SalesReportFilterSerializer(data=request.query_params)
+    filters.is_valid(raise_exception=True)
+    options = dict(filters.validated_data)
+    report = {
+        'day': rollups.daily_report,
+        'movie': rollups.movie_report,
+        'showtime': rollups.showtime_report,
+    }[options.pop('group')]
+    return Response({'results': report(**options)})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def booking_events(request):
+    """
+    Tail the booking event log
+    GET /api/events/?after=0-0&limit=500
+    Pass the returned cursor as `after` to get the next batch; it stays
+    put when nothing new has been logged.
+    """
+    filters = EventLogFilterSerializer(data=request.query_params)
+    filters.is_valid(raise_exception=True)
+    after = events.parse_cursor(filters.validated_data['after'])
+    batch = events.read_events(after, filters.validated_data['limit'])
+    return Response({
+        'results': BookingEventSerializer(batch, many=True).data,
+        'cursor': events.format_cursor(events.position(batch[-1]) if batch else after),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """
+    Hit/miss counters of the response cache for this process
+    GET /api/cache/stats/
+    """
+    return Response(cache.stats())
+
+def metrics_endpoint(request):
+    """
+    Request metrics in the Prometheus text format
+    GET /metrics
+    """
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def slow_queries(request):
+    """
+    Most recent slow queries from sampled requests, with their call sites
+    GET /api/metrics/slow-queries/
+    """
+    return Response(metrics.slow_queries())
+
+class MovieViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
 
+    def list(self, request, *args, **kwargs):
+        """
+        List movies, served from cache until the catalog changes
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = self.queryset_etag(queryset)
+
+        def build():
+            serializer = self.get_serializer(queryset, many=True)
+            return {'etag': etag, 'last_modified': None, 'data': serializer.data}, None
+
+        # Keyed on the ETag as well, so no worker pairs it with an older body
+        return self.conditional_entry(read_through(
+            'movie_list', [CATALOG_SCOPE], build, vary=cache_vary(request) + etag
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Get one movie, served from cache until it changes
+        """
+        pk = kwargs['pk']
+        if not pk.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+
+        def build():
+            instance = self.get_object()
+            etag, modified = object_validators(request, instance, self.validator_fields)
+            data = self.get_serializer(instance).data
+            return {'etag': etag, 'last_modified': modified, 'data': data}, None
+
+        return self.conditional_entry(read_through(
+            'movie_detail', [movie_scope(pk)], build, vary=cache_vary(request)
+        ))
+
     @action(detail=True, methods=['get'])
     def available_seats(self, request, pk=None):
-        movie = self.get_object()
-        available_seats = Seat.objects.filter(booking_status=False)
-        serializer = SeatSerializer(available_seats, many=True)
-        return Response({
-            'movie': movie.title,
-            'available_seats': serializer.data
-        })
+        """
+        Get available seats, scoped to one of the movie's showtimes
+        GET /movies/{id}/available_seats/?showtime=1
+        """
+        showtime_id = get_showtime_id(request)
+
+        def build():
+            movie = self.get_object()
+            timeout = None
+            if showtime_id is not None:
+                showtime = get_object_or_404(movie.showtimes, pk=showtime_id)
+                available_seats = showtime.seat_states.available().select_related('seat')
+                serializer = SeatStateSerializer(available_seats, many=True)
+                timeout = availability_timeout(showtime_id)
+            else:
+                available_seats = Seat.objects.filter(booking_status=False)
+                serializer = SeatSerializer(available_seats, many=True)
+            return {
+                'movie': movie.title,
+                'available_seats': serializer.data
+            }, timeout
 
-class SeatViewSet(viewsets.ModelViewSet):
+        if not pk.isdigit():
+            return Response(build()[0])
+        scopes = [movie_scope(pk), SEATS_SCOPE]
+        if showtime_id is not None:
+            scopes.append(showtime_scope(showtime_id))
+        return Response(read_through(
+            'movie_available_seats', scopes, build, vary=cache_vary(request)
+        ))
+
+    @action(detail=False, methods=['get'], pagination_class=MovieSearchPagination)
+    def search(self, request):
+        """
+        Search movies by title and description, best matches first
+        GET /movies/search/?q=ali&released_from=2020-01-01&released_to=2024-12-31&duration=long&available=true
+        duration is short (under 90 minutes), medium or long (150 and
+        over); available keeps movies with seats on sale for an upcoming
+        showtime. facets=true adds counts per duration and of available
+        movies among the matches. Paginated with limit and offset.
+        """
+        filters = MovieSearchSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        options = dict(filters.validated_data)
+        text = options.pop('q')
+        facets = options.pop('facets')
+
+        def build():
+            movies = search_movies(filter_movies(self.get_queryset(), **options), text)
+            page = self.paginate_queryset(movies)
+            data = self.get_paginated_response(self.get_serializer(page, many=True).data).data
+            if facets:
+                data['facets'] = facet_counts(movies)
+            # Seats selling out changes no catalog version
+            return data, AVAILABILITY_TIMEOUT if options['available'] or facets else None
+
+        return Response(read_through('movie_search', [CATALOG_SCOPE], build, vary=cache_vary(request)))
+
+class SeatViewSet(ConditionalGetMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     queryset = Seat.objects.all()
     serializer_class = SeatSerializer
+    pagination_class = SeatCursorPagination
 
     def get_queryset(self):
         """
@@ -44,51 +568,328 @@ class SeatViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    def state_scopes(self, showtime_id):
+        # Seat map changes bump the showtime's scope
+        return [SEATS_SCOPE, showtime_scope(showtime_id)]
+
+    def get_showtime_states(self, showtime_id):
+        return SeatState.objects.filter(showtime_id=showtime_id).select_related('seat')
+
     @action(detail=False, methods=['get'])
     def available(self, request):
         """
-        Get all available seats
+        Get all available seats, optionally for a single showtime
         GET /seats/available/
+        GET /seats/available/?showtime=1
         """
+        showtime_id = get_showtime_id(request)
+        if showtime_id is not None:
+            states = self.get_showtime_states(showtime_id).available()
+            etag = seat_map_etag(request, showtime_id)
+
+            def build():
+                data = self.list_response(states, SeatStateSerializer).data
+                return data, availability_timeout(showtime_id)
+
+            # Keyed on the ETag as well, so no worker pairs it with an older body
+            return self.conditional_list(
+                lambda: Response(read_through(
+                    'seats_available', self.state_scopes(showtime_id), build, vary=cache_vary(request) + etag
+                )),
+                etag=etag
+            )
         available_seats = Seat.objects.filter(booking_status=False)
-        serializer = self.get_serializer(available_seats, many=True)
-        return Response(serializer.data)
+        return self.conditional_list(
+            lambda: self.list_response(available_seats), etag=self.queryset_etag(available_seats)
+        )
 
     @action(detail=False, methods=['get'])
     def booked(self, request):
         """
-        Get all booked seats
+        Get all booked seats, optionally for a single showtime
         GET /seats/booked/
+        GET /seats/booked/?showtime=1
         """
+        showtime_id = get_showtime_id(request)
+        if showtime_id is not None:
+            states = self.get_showtime_states(showtime_id).booked()
+            return self.conditional_list(
+                lambda: self.list_response(states, SeatStateSerializer), etag=seat_map_etag(request, showtime_id)
+            )
         booked_seats = Seat.objects.filter(booking_status=True)
-        serializer = self.get_serializer(booked_seats, many=True)
-        return Response(serializer.data)
+        return self.conditional_list(
+            lambda: self.list_response(booked_seats), etag=self.queryset_etag(booked_seats)
+        )
 
-class BookingViewSet(viewsets.ModelViewSet):
+class AuditoriumViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for auditoriums and their seat layouts.
+
+    Provides:
+    - list: GET /auditoriums/
+    - retrieve: GET /auditoriums/{id}/
+    - import_layout: POST /auditoriums/import/
+    """
+    queryset = Auditorium.objects.annotate(seat_count=Count('seats')).order_by('id')
+    serializer_class = AuditoriumSerializer
+
+    @action(
+        detail=False, methods=['post'], url_path='import',
+        permission_classes=[IsAdminUser], parser_classes=[JSONParser, CSVTextParser],
+    )
+    def import_layout(self, request):
+        """
+        Create or update every seat of an auditorium from a layout
+        POST /auditoriums/import/
+        Expected payload: {
+            "auditorium": "Screen 1",
+            "rows": [{"row": "A", "seats": 20, "aisles": [5, 15], "accessible": [1, 2], "premium": true}]
+        }
+        or a text/csv body (row,seats,aisles,accessible,premium) with ?auditorium=Screen 1.
+        Safe to repeat: seats already in place are left alone.
+        """
+        data = request.data
+        if isinstance(data, str):
+            data = {'auditorium': request.query_params.get('auditorium'), 'rows': parse_csv_layout(data)}
+        serializer = SeatLayoutSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        result = import_layout(serializer.validated_data['auditorium'], serializer.validated_data['rows'])
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+class ShowtimeViewSet(viewsets.ModelViewSet):
+    queryset = Showtime.objects.all()
+    serializer_class = ShowtimeSerializer
+    throttle_groups = {'best_available': BOOKING_WRITES}
+
+    def get_queryset(self):
+        """
+        Filter showtimes by movie
+        GET /showtimes/?movie=1
+        """
+        queryset = Showtime.objects.order_by('starts_at')
+        movie_id = self.request.query_params.get('movie')
+        if movie_id and movie_id.isdigit():
+            queryset = queryset.filter(movie_id=movie_id)
+        return queryset
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def schedule(self, request):
+        """
+        Check proposed showtimes and create them all, or none
+        POST /showtimes/schedule/
+        Expected payload: {
+            "showtimes": [{"movie": 1, "auditorium": 1, "starts_at": "2026-10-19T13:00:00Z"}, ...],
+            "dry_run": false
+        }
+        A showtime occupies its auditorium for the movie's duration plus the
+        auditorium's cleaning_minutes. Responds 409 listing, per proposal,
+        the existing showtimes and earlier proposals it overlaps; a dry run
+        responds 200 with the (possibly empty) conflicts and creates nothing.
+        """
+        serializer = ShowtimeScheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dry_run = serializer.validated_data['dry_run']
+        showtimes, conflicts = schedule_showtimes(serializer.validated_data['showtimes'], dry_run)
+        if dry_run:
+            return Response({'conflicts': conflicts})
+        if conflicts:
+            return Response({'conflicts': conflicts}, status=status.HTTP_409_CONFLICT)
+        return Response(
+            {'created': len(showtimes), 'showtimes': ShowtimeSerializer(showtimes, many=True).data},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def generate(self, request):
+        """
+        Fill a week of auditoriums with showtimes in one transaction
+        POST /showtimes/generate/
+        Expected payload: {
+            "week_start": "2026-10-19",
+            "opens": "10:00",
+            "closes": "23:30",
+            "lineup": [{"auditorium": 1, "movies": [3, 5]}],
+            "dry_run": false
+        }
+        Each auditorium plays its movies in turn from opening until the
+        last show starting by closing time, around existing showtimes.
+        A dry run lists the planned showtimes without creating them.
+        """
+        serializer = WeekScheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+        showtimes = generate_week(
+            options['week_start'], options['opens'], options['closes'], options['lineup'], options['dry_run']
+        )
+        if options['dry_run']:
+            planned = [Showtime(**proposal) for proposal in showtimes]
+            return Response({'showtimes': ShowtimeSerializer(planned, many=True).data})
+        return Response(
+            {'created': len(showtimes), 'showtimes': ShowtimeSerializer(showtimes, many=True).data},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['get'])
+    def layout(self, request, pk=None):
+        """
+        Get the seat layout that availability bitsets refer to
+        GET /showtimes/{id}/layout/
+        Seats are [id, seat_number] pairs; bit i of the availability
+        bitset describes seats[i]. Honors If-None-Match.
+        """
+        showtime = self.get_object()
+        seats, etag = showtime_layout(showtime)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response({'showtime': showtime.id, 'seats': seats})
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=300)
+        return response
+
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """
+        Get seat availability as a base64 bitset over the layout
+        GET /showtimes/{id}/availability/
+        """
+        def build():
+            showtime = self.get_object()
+            count, bitmap = showtime_availability(showtime)
+            return {
+                'showtime': showtime.id,
+                'version': showtime.seat_version,
+                'seats': count,
+                'available': bitmap,
+            }, availability_timeout(showtime.id)
+
+        if not pk.isdigit():
+            return Response(build()[0])
+        return Response(read_through('showtime_availability', [showtime_scope(pk)], build))
+
+    @action(detail=True, methods=['get'])
+    def prices(self, request, pk=None):
+        """
+        Get the current price of each seat zone
+        GET /showtimes/{id}/prices/
+        Seat zones come from the layout: premium seats are "premium".
+        """
+        if not pk.isdigit():
+            raise Http404("No showtime matches the given query.")
+        table = pricing.price_table(pk)
+        return Response({key: table[key] for key in ('showtime', 'tier', 'prices')})
+
+    @action(detail=True, methods=['get'])
+    def quote(self, request, pk=None):
+        """
+        Price a basket of seats in one call
+        GET /showtimes/{id}/quote/?seats=1,2,3
+        Reads the cached seat zones and the showtime's sales row, so it is
+        cheap enough to call on every change of the seat picker.
+        Availability is not checked.
+        """
+        seats = request.query_params.get('seats', '').split(',')
+        if not pk.isdigit() or not all(seat.strip().isdigit() for seat in seats):
+            raise ValidationError({'seats': 'A comma-separated list of seat ids is required'})
+        result, unknown = pricing.quote(pk, [int(seat) for seat in seats])
+        if unknown:
+            raise ValidationError({'seats': f"Not seats of this showtime: {', '.join(map(str, unknown))}"})
+        return Response(result)
+
+    @action(
+        detail=True, methods=['post'], permission_classes=[IsAuthenticated, admission.AdmissionTokenHolder]
+    )
+    def best_available(self, request, pk=None):
+        """
+        Hold (or book) the best block of adjacent seats for a party
+        POST /showtimes/{id}/best_available/
+        Expected payload: {
+            "party_size": 4,
+            "center": true,
+            "row_from": "C",
+            "row_to": "J",
+            "accessible": false,
+            "book": false
+        }
+        Responds 201 with the hold (or bookings with "book": true), or 409
+        if no block of that many adjacent seats matches.
+        """
+        showtime = self.get_object()
+        serializer = BestAvailableSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+        book = options.pop('book')
+
+        for _ in range(best_available.CLAIM_ATTEMPTS):
+            now = timezone.now()
+            index = best_available.showtime_index(showtime, now)
+            unknown = [
+                key for key in ('row_from', 'row_to')
+                if key in options and options[key] not in index.labels
+            ]
+            if unknown:
+                raise ValidationError({key: 'No such row in this auditorium' for key in unknown})
+            seat_ids = index.best_block(**options)
+            if seat_ids is None:
+                return Response(
+                    {'error': 'No block of adjacent seats matches this request'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            if book:
+                bookings = book_seats(request.user, showtime, seat_ids)
+                if bookings is not None:
+                    return Response(serialize_bookings(bookings), status=status.HTTP_201_CREATED)
+            else:
+                hold = hold_seats(request.user, showtime, seat_ids, now)
+                if hold is not None:
+                    hold = SeatHold.objects.prefetch_related('seat_states').get(pk=hold.pk)
+                    return Response(SeatHoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+            # Another process took one of the seats: look again
+            best_available.forget(showtime.pk)
+            showtime.refresh_from_db(fields=['seat_version'])
+
+        return Response(
+            {'error': 'The seats kept being taken, please try again'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+class BookingViewSet(ConditionalGetMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     """
     ViewSet for users to book seats and view their booking history.
     
     Provides:
-    - list: GET /bookings/ (user's bookings)
+    - list: GET /bookings/ (user's bookings, cursor paginated)
     - create: POST /bookings/
+    - bulk: POST /bookings/bulk/
     - retrieve: GET /bookings/{id}/
     - update: PUT /bookings/{id}/
     - partial_update: PATCH /bookings/{id}/
     - destroy: DELETE /bookings/{id}/
+    - cancel: POST /bookings/{id}/cancel/
+    - transfer: POST /bookings/{id}/transfer/
     """
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
-    permission_classes = [IsAuthenticated]
+    # Admission tokens are checked against the user for create and bulk
+    permission_classes = [IsAuthenticated, admission.AdmissionTokenHolder]
+    pagination_class = BookingCursorPagination
+    throttle_groups = {
+        'create': BOOKING_WRITES, 'bulk': BOOKING_WRITES, 'update': BOOKING_WRITES,
+        'partial_update': BOOKING_WRITES, 'transfer': BOOKING_WRITES, 'cancel': CANCELS, 'destroy': CANCELS,
+    }
+    validator_fields = ('updated_at', 'movie__updated_at', 'seat__updated_at')
+    nested_models = (Movie, Seat)
 
     def get_queryset(self):
         """
         Return bookings for the current user only
         Admin users can see all bookings
+        Nested user/movie/seat data is joined in so listing stays one query.
         """
         user = self.request.user
+        queryset = Booking.objects.select_related('user', 'movie', 'seat')
         if user.is_staff:
-            return Booking.objects.all()
-        return Booking.objects.filter(user=user)
+            return queryset
+        return queryset.filter(user=user)
 
     def get_serializer_class(self):
         """
@@ -96,47 +897,105 @@ class BookingViewSet(viewsets.ModelViewSet):
         """
         if self.action == 'create':
             return BookingCreateSerializer
+        if self.action == 'bulk':
+            return BulkBookingCreateSerializer
         return BookingSerializer
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         """
-        Create a new booking and mark seat as booked
+        Create a new booking and mark seat as booked for the showtime
         POST /bookings/
         Expected payload: {
-            "movie": 1,
+            "showtime": 1,
             "seat": 1
         }
+        Responds 409 if the seat is already taken for that showtime.
+        Retries sent with the same Idempotency-Key header get the first
+        response back.
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        movie = serializer.validated_data['movie']
+        showtime = serializer.validated_data['showtime']
         seat = serializer.validated_data['seat']
         
-        # Check if seat is available
-        if seat.booking_status:
-            return Response(
-                {'error': 'This seat is already booked'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Create booking
         with transaction.atomic():
+            # Claim the seat with a conditional UPDATE so only one of any
+            # concurrent requests can flip it; other showtimes are untouched.
+            # A lapsed hold on it is cleared so the expiry sweep skips it
+            claimed = SeatState.objects.filter(
+                showtime=showtime, seat=seat
+            ).available().update(booking_status=True, hold=None, held_until=None)
+            if not claimed:
+                return Response(
+                    {'error': 'This seat is already booked for this showtime'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            
             booking = Booking.objects.create(
                 user=request.user,
-                movie=movie,
-                seat=seat
+                movie=showtime.movie,
+                showtime=showtime,
+                seat=seat,
+                booking_date=timezone.localdate(),
+                price=pricing.seat_prices(showtime.pk, [seat.pk])[seat.pk]
             )
-            
-            # Mark seat as booked
-            seat.booking_status = True
-            seat.save()
+            rollups.record_bookings([booking])
+            seat_map_changed(showtime.pk, unavailable=[seat.pk])
+            events.record(BookingEvent.CREATED, [booking])
         
         return Response(
             BookingSerializer(booking).data,
             status=status.HTTP_201_CREATED
         )
 
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def bulk(self, request):
+        """
+        Book several seats for one showtime, all or nothing
+        POST /bookings/bulk/
+        Expected payload: {
+            "showtime": 1,
+            "seats": [1, 2, 3, 4]
+        }
+        Responds 409 with the unavailable seats if any seat is taken.
+        Honors Idempotency-Key like create.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        showtime = serializer.validated_data['showtime']
+        seat_ids = serializer.validated_data['seats']
+
+        bookings = book_seats(request.user, showtime, seat_ids)
+        if bookings is None:
+            available = set(SeatState.objects.filter(
+                showtime=showtime, seat_id__in=seat_ids
+            ).available().values_list('seat_id', flat=True))
+            return Response(
+                {
+                    'error': 'Some of these seats are not available for this showtime',
+                    'unavailable_seats': [seat_id for seat_id in seat_ids if seat_id not in available]
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+
+        return Response(serialize_bookings(bookings), status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Delete a booking the same way cancel does: log it, take it off the
+        sales rollups and free its seat
+        """
+        if not cancel_booking(self.get_object()):
+            return Response(
+                {'error': 'This booking has already been cancelled or transferred'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=False, methods=['get'])
     def my_bookings(self, request):
         """
@@ -144,14 +1003,16 @@ class BookingViewSet(viewsets.ModelViewSet):
         GET /bookings/my_bookings/
         """
         bookings = self.get_queryset().filter(user=request.user)
-        serializer = self.get_serializer(bookings, many=True)
-        return Response(serializer.data)
+        return self.conditional_list(lambda: self.list_response(bookings), etag=self.queryset_etag(bookings))
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def cancel(self, request, pk=None):
         """
         Cancel a booking and free up the seat
         POST /bookings/{id}/cancel/
+        Honors Idempotency-Key like create, so a retried cancel gets the
+        first answer rather than a 404.
         """
         booking = self.get_object()
         
@@ -162,17 +1023,55 @@ class BookingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Free the seat and delete booking
-        with transaction.atomic():
-            seat = booking.seat
-            seat.booking_status = False
-            seat.save()
-            booking.delete()
+        # Free the seat and delete booking, keeping it in the event log
+        if not cancel_booking(booking):
+            return Response(
+                {'error': 'This booking has already been cancelled or transferred'},
+                status=status.HTTP_409_CONFLICT
+            )
         
         return Response({
             'message': 'Booking cancelled successfully'
         })
 
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def transfer(self, request, pk=None):
+        """
+        Give a booking to another user
+        POST /bookings/{id}/transfer/
+        Expected payload: {
+            "user": "username"
+        }
+        Responds 409 if the booking changed hands while this ran. Honors
+        Idempotency-Key like create.
+        """
+        booking = self.get_object()
+        if booking.user != request.user and not request.user.is_staff:
+            return Response(
+                {'error': 'You can only transfer your own bookings'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        serializer = BookingTransferSerializer(data=request.data, context={'booking': booking})
+        serializer.is_valid(raise_exception=True)
+        recipient = serializer.validated_data['user']
+
+        with transaction.atomic():
+            # Conditional on the owner, so concurrent transfers can't both win
+            moved = Booking.objects.filter(pk=booking.pk, user_id=booking.user_id).update(
+                user=recipient, updated_at=timezone.now()
+            )
+            if not moved:
+                return Response(
+                    {'error': 'This booking has already been transferred'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            from_user_id = booking.user_id
+            booking.user = recipient
+            events.record(BookingEvent.TRANSFERRED, [booking], from_user_id=from_user_id)
+
+        return Response(BookingSerializer(booking).data)
+
     @action(detail=False, methods=['get'])
     def by_movie(self, request):
         """
@@ -188,5 +1087,205 @@ class BookingViewSet(viewsets.ModelViewSet):
             )
         
         bookings = self.get_queryset().filter(movie_id=movie_id)
-        serializer = self.get_serializer(bookings, many=True)
-        return Response(serializer.data)
+        return self.conditional_list(lambda: self.list_response(bookings), etag=self.queryset_etag(bookings))
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Stream bookings for reporting, oldest first
+        GET /bookings/export/?format=csv&start=2025-01-01&end=2025-01-31&movie=1
+        Use ?format=ndjson (or Accept: application/x-ndjson) for one JSON
+        object per line. Staff export every booking, users their own.
+        """
+        filters = BookingExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        filters = filters.validated_data
+
+        bookings = self.get_queryset()
+        if 'start' in filters:
+            bookings = bookings.filter(booking_date__gte=filters['start'])
+        if 'end' in filters:
+            bookings = bookings.filter(booking_date__lte=filters['end'])
+        if 'movie' in filters:
+            bookings = bookings.filter(movie_id=filters['movie'])
+        return export_response(request._request, bookings, request.accepted_renderer.format)
+
+class SeatHoldViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for reserving seats while the user checks out.
+
+    Provides:
+    - list: GET /holds/ (user's active holds)
+    - create: POST /holds/
+    - retrieve: GET /holds/{id}/
+    - destroy: DELETE /holds/{id}/ (release the seats)
+    - confirm: POST /holds/{id}/confirm/
+    """
+    queryset = SeatHold.objects.all()
+    serializer_class = SeatHoldSerializer
+    permission_classes = [IsAuthenticated, admission.AdmissionTokenHolder]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+    throttle_groups = {'create': BOOKING_WRITES, 'confirm': BOOKING_WRITES, 'destroy': CANCELS}
+
+    def get_queryset(self):
+        """
+        Return the current user's unexpired holds
+        """
+        return SeatHold.objects.active().filter(user=self.request.user).prefetch_related(
+            Prefetch('seat_states', queryset=SeatState.objects.only('id', 'hold_id', 'seat_id'))
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return SeatHoldCreateSerializer
+        return SeatHoldSerializer
+
+    def create(self, request, *args, **kwargs):
+        """
+        Hold seats for SEAT_HOLD_TTL_SECONDS
+        POST /holds/
+        Expected payload: {
+            "showtime": 1,
+            "seats": [1, 2, 3]
+        }
+        Responds 409 if any seat is booked or held by someone else.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        showtime = serializer.validated_data['showtime']
+        seat_ids = serializer.validated_data['seats']
+
+        hold = hold_seats(request.user, showtime, seat_ids)
+        if hold is None:
+            return Response(
+                {'error': 'Some of these seats are not available for this showtime'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        hold = self.get_queryset().get(pk=hold.pk)
+        return Response(SeatHoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Release held seats back into inventory
+        DELETE /holds/{id}/
+        Releasing a waitlist offer declines it and passes the seat on.
+        """
+        release_hold(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, pk=None):
+        """
+        Turn a hold into bookings
+        POST /holds/{id}/confirm/
+        """
+        hold = self.get_object()
+        showtime = hold.showtime
+        now = timezone.now()
+
+        with transaction.atomic():
+            seat_ids = list(
+                SeatState.objects.select_for_update()
+                .filter(hold=hold, held_until__gt=now)
+                .values_list('seat_id', flat=True)
+            )
+            if not seat_ids:
+                return Response(
+                    {'error': 'This hold has expired'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            SeatState.objects.filter(hold=hold).update(
+                booking_status=True, hold=None, held_until=None
+            )
+            bookings = create_bookings(request.user, showtime, seat_ids)
+            close_offer(hold, WaitlistEntry.ACCEPTED)
+            hold.delete()
+            seat_map_changed(showtime.pk, unavailable=seat_ids)
+            events.record(BookingEvent.CREATED, bookings)
+
+        return Response(serialize_bookings(bookings), status=status.HTTP_201_CREATED)
+
+class WaitlistViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for queueing for seats at sold-out showtimes.
+
+    Provides:
+    - list: GET /waitlist/ (user's entries, newest first)
+    - create: POST /waitlist/
+    - retrieve: GET /waitlist/{id}/
+    - destroy: DELETE /waitlist/{id}/ (leave the queue or decline an offer)
+
+    Offers arrive as holds; confirm them with POST /holds/{id}/confirm/.
+    """
+    queryset = WaitlistEntry.objects.all()
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+    throttle_groups = {'create': BOOKING_WRITES, 'destroy': CANCELS}
+
+    def get_queryset(self):
+        """
+        Return the current user's entries with their place in the queue
+        """
+        ahead = WaitlistEntry.objects.waiting().filter(
+            showtime=OuterRef('showtime'), id__lt=OuterRef('id')
+        ).order_by().values('showtime').annotate(count=Count('id')).values('count')
+        return WaitlistEntry.objects.filter(user=self.request.user).select_related('hold').annotate(
+            ahead=Coalesce(Subquery(ahead), 0)
+        ).order_by('-id')
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return WaitlistJoinSerializer
+        return WaitlistEntrySerializer
+
+    def create(self, request, *args, **kwargs):
+        """
+        Join a sold-out showtime's waitlist
+        POST /waitlist/
+        Expected payload: {
+            "showtime": 1
+        }
+        Responds 409 if seats are still on sale or the user is already waiting.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        showtime = serializer.validated_data['showtime']
+
+        if SeatState.objects.filter(showtime=showtime).available().exists():
+            return Response(
+                {'error': 'This showtime still has seats available'},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            with transaction.atomic():
+                entry = WaitlistEntry.objects.create(user=request.user, showtime=showtime)
+        except IntegrityError:
+            return Response(
+                {'error': 'You are already on the waitlist for this showtime'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        entry = self.get_queryset().get(pk=entry.pk)
+        return Response(WaitlistEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Leave the waitlist, declining any outstanding offer
+        DELETE /waitlist/{id}/
+        """
+        entry = self.get_object()
+        if entry.status == WaitlistEntry.WAITING:
+            WaitlistEntry.objects.filter(pk=entry.pk, status=WaitlistEntry.WAITING).update(
+                status=WaitlistEntry.LEFT, updated_at=timezone.now()
+            )
+        elif entry.status == WaitlistEntry.OFFERED and entry.hold is not None:
+            release_hold(entry.hold)
+        else:
+            return Response(
+                {'error': 'This waitlist entry is no longer active'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,168 @@
+"""
+Waitlist for sold-out showtimes.
+
+Users join a showtime's waitlist instead of polling its seat map. When a
+booking is cancelled or a hold released while anyone is waiting, the seat
+is not put back on sale: reserve_for_waitlist() keeps it back (held_until
+with no hold) and queues a WaitlistRelease row.
+
+The waitlist worker (`python manage.py process_waitlist`) takes releases
+oldest first and offers each seat to the showtime's longest-waiting user
+as a SeatHold lasting WAITLIST_OFFER_TTL_SECONDS; confirming the hold books
+the seat. Offers that lapse or are declined go back into the queue for the
+next user. If the worker is down, reserved seats go back on sale after
+WAITLIST_RELEASE_GRACE_SECONDS like any lapsed hold.
+
+Offers are published on the SEAT_EVENTS_BACKEND to the user's topic, which
+GET /api/waitlist/stream/ relays as server-sent events.
+"""
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SeatHold, SeatState, WaitlistEntry, WaitlistRelease
+from .realtime import get_backend, seat_map_changed, sse_event
+
+BATCH_SIZE = 100
+
+
+def waitlist_topic(user_id):
+    return f'waitlist:{user_id}'
+
+
+def reserve_for_waitlist(showtime_id, seat_ids, now=None):
+    """
+    Keep freed seats back for the waitlist instead of selling them
+    Call inside the transaction that freed the seats, in place of
+    seat_map_changed(): the seats stay unavailable. Returns False, having
+    done nothing, if nobody is waiting for the showtime.
+    """
+    if not seat_ids or not WaitlistEntry.objects.waiting().filter(showtime_id=showtime_id).exists():
+        return False
+    now = now or timezone.now()
+    SeatState.objects.filter(
+        showtime_id=showtime_id, seat_id__in=seat_ids, booking_status=False, hold__isnull=True
+    ).update(held_until=now + timedelta(seconds=settings.WAITLIST_RELEASE_GRACE_SECONDS))
+    WaitlistRelease.objects.bulk_create([
+        WaitlistRelease(showtime_id=showtime_id, seat_id=seat_id) for seat_id in seat_ids
+    ])
+    return True
+
+
+def offer_message(entry):
+    return {
+        'id': entry.id,
+        'showtime': entry.showtime_id,
+        'status': entry.status,
+        'hold': entry.hold_id,
+        'offer_expires_at': entry.hold.expires_at.isoformat() if entry.hold else None,
+    }
+
+
+def publish_offer(entry):
+    get_backend().publish(waitlist_topic(entry.user_id), offer_message(entry))
+
+
+def offer_seat(release, now):
+    """
+    Offer a released seat to the next user in line, or put it on sale
+    Returns 'offered', 'released', or None if the seat was taken meanwhile.
+    """
+    seat = SeatState.objects.filter(
+        showtime_id=release.showtime_id, seat_id=release.seat_id, booking_status=False, hold__isnull=True
+    )
+    entry = (
+        WaitlistEntry.objects.select_for_update(skip_locked=True)
+        .waiting()
+        .filter(showtime_id=release.showtime_id)
+        .order_by('id')
+        .first()
+    )
+    if entry is None:
+        if not seat.update(held_until=None):
+            return None
+        seat_map_changed(release.showtime_id, available=[release.seat_id])
+        return 'released'
+
+    hold = SeatHold.objects.create(
+        user_id=entry.user_id,
+        showtime_id=release.showtime_id,
+        expires_at=now + timedelta(seconds=settings.WAITLIST_OFFER_TTL_SECONDS)
+    )
+    if not seat.update(hold=hold, held_until=hold.expires_at):
+        hold.delete()
+        return None
+    entry.status = WaitlistEntry.OFFERED
+    entry.hold = hold
+    entry.save(update_fields=['status', 'hold', 'updated_at'])
+    transaction.on_commit(lambda: publish_offer(entry))
+    return 'offered'
+
+
+def process_waitlist(now=None, batch_size=BATCH_SIZE):
+    """
+    One pass of the waitlist worker
+    Expires lapsed holds (putting offered seats back in the queue), then
+    offers up to `batch_size` released seats in the order they were freed.
+    Several workers can run at once; each skips releases another has locked.
+    """
+    now = now or timezone.now()
+    SeatHold.objects.expire(now)
+    counts = {
+        'expired': WaitlistEntry.objects.filter(
+            status=WaitlistEntry.OFFERED, hold__isnull=True
+        ).update(status=WaitlistEntry.EXPIRED, updated_at=now),
+        'offered': 0,
+        'released': 0,
+        'skipped': 0,
+    }
+    with transaction.atomic():
+        releases = list(
+            WaitlistRelease.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+        )
+        for release in releases:
+            counts[offer_seat(release, now) or 'skipped'] += 1
+        WaitlistRelease.objects.filter(pk__in=[release.pk for release in releases]).delete()
+    return counts
+
+
+def close_offer(hold, status):
+    """
+    Record how an offer ended before its hold is confirmed or released
+    """
+    WaitlistEntry.objects.filter(hold=hold, status=WaitlistEntry.OFFERED).update(
+        status=status, updated_at=timezone.now()
+    )
+
+
+def active_entries(user_id):
+    entries = WaitlistEntry.objects.active().filter(user_id=user_id).select_related('hold').order_by('id')
+    return [offer_message(entry) for entry in entries]
+
+
+async def waitlist_events(user_id, heartbeat=15):
+    """
+    Server-sent events for one user: their active entries, then offers
+    """
+    backend = get_backend()
+    topic = waitlist_topic(user_id)
+    queue = backend.subscribe(topic)
+    try:
+        yield sse_event('snapshot', await sync_to_async(active_entries)(user_id))
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if message is None:
+                # Offers were dropped while we lagged; resend the entries
+                yield sse_event('snapshot', await sync_to_async(active_entries)(user_id))
+                continue
+            yield sse_event('offer', message)
+    finally:
+        backend.unsubscribe(topic, queue)